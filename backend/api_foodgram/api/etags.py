@@ -0,0 +1,89 @@
+"""
+ETag для ответов RecipeViewSet.
+
+Версия вычисляется до сериализации: для рецепта - одним легким запросом
+по его revision, данным автора и флагам текущего пользователя, для
+страницы списка - по уже загруженным строкам страницы, до загрузки тегов
+и ингредиентов. Переименование тегов и ингредиентов меняет версию
+REFERENCES, общую для всех рецептов: другие процессы видят ее не позже
+чем через INDEX_VERSION_CHECK_SECONDS.
+"""
+import hashlib
+
+from django.db.models import Exists, OuterRef
+from django.utils.http import parse_etags
+
+from api.utils import get_subscribed_author_ids
+from recipes.index_version import REFERENCES, get_index_version
+from recipes.models import UserFavoriteRecipe, UserShoppingRecipe
+from users.models import Follow
+
+
+# поля автора из ответа с рецептом
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+def make_etag(*parts, weak=False):
+    digest = hashlib.sha1(
+        '|'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return ('W/' if weak else '') + f'"{digest}"'
+
+
+def strip_weak(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def etag_matches(request, etag):
+    """Слабое сравнение ETag из If-None-Match с текущим."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    if '*' in etags:
+        return True
+    return strip_weak(etag) in {strip_weak(value) for value in etags}
+
+
+def get_recipe_etag(queryset, pk, user):
+    """Сильный ETag рецепта или None, если рецепт не найден."""
+    queryset = queryset.filter(pk=pk)
+    fields = ['revision', 'image_widths', 'author_id',
+              *(f'author__{field}' for field in AUTHOR_FIELDS)]
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            favorited=Exists(UserFavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            in_shopping_cart=Exists(UserShoppingRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author')
+            ))
+        )
+        fields += ['favorited', 'in_shopping_cart', 'subscribed']
+    version = queryset.values_list(*fields).first()
+    if version is None:
+        return None
+    return make_etag(pk, user.pk, get_index_version(REFERENCES), *version)
+
+
+def get_recipe_page_etag(request, recipes, *page_info):
+    """Слабый ETag страницы списка рецептов. page_info - число рецептов
+    и ссылки на соседние страницы, порядок рецептов входит в версию."""
+    subscribed = get_subscribed_author_ids(
+        request, {recipe.author_id for recipe in recipes}
+    )
+    return make_etag(
+        request.get_full_path(),
+        request.user.pk,
+        get_index_version(REFERENCES),
+        *page_info,
+        [(recipe.pk, recipe.revision, recipe.image_widths,
+          recipe.is_favorited, recipe.is_in_shopping_cart,
+          recipe.author_id in subscribed,
+          *(getattr(recipe.author, field) for field in AUTHOR_FIELDS))
+         for recipe in recipes],
+        weak=True
+    )
@@ -3,6 +3,8 @@ from rest_framework import serializers
 
 import base64
 
+from recipes.images import get_image_srcset
+
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
@@ -13,3 +15,14 @@ class Base64ImageField(serializers.ImageField):
             data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
 
         return super().to_internal_value(data)
+
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии картинки: {ширина: {формат: url}}."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return get_image_srcset(recipe, self.context.get('request'))
@@ -1,6 +1,87 @@
-from rest_framework.pagination import PageNumberPagination
+import binascii
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class RecipePagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Пагинация по ключу (pub_date, id) без COUNT и OFFSET.
+    Включается параметром cursor, для первой страницы он пустой."""
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+
+class FeedPagination(BasePagination):
+    """Пагинация ленты по ключу (pub_date, id) последнего рецепта
+    страницы. Лента листается только вперед."""
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param, '')
+        if value.isdigit() and int(value) > 0:
+            return min(int(value), self.max_page_size)
+        return self.page_size
+
+    def decode_cursor(self, request):
+        value = request.query_params.get(self.cursor_query_param)
+        if not value:
+            return None
+        try:
+            pub_date, recipe_id = b64decode(
+                value.encode(), validate=True
+            ).decode().split('|')
+            position = parse_datetime(pub_date), int(recipe_id)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        pub_date, recipe_id = position
+        value = b64encode(f'{pub_date.isoformat()}|{recipe_id}'.encode())
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            value.decode()
+        )
+
+    def paginate_positions(self, request, get_positions):
+        """get_positions(position, limit) возвращает позиции ленты
+        после position; лишняя позиция показывает, есть ли следующая
+        страница."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        positions = get_positions(self.decode_cursor(request), page_size + 1)
+        self.next_position = (
+            positions[page_size - 1] if len(positions) > page_size else None
+        )
+        return positions[:page_size]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
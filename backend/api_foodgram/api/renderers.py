@@ -0,0 +1,28 @@
+from rest_framework import renderers
+
+
+class PassthroughRenderer(renderers.BaseRenderer):
+    """Рендерер для выбора формата ответа, содержимое формирует view."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class PDFRenderer(PassthroughRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class TextRenderer(PassthroughRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(PassthroughRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class JSONStreamRenderer(PassthroughRenderer):
+    media_type = 'application/json'
+    format = 'json'
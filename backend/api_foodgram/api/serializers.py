@@ -1,14 +1,20 @@
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import (F, Manager, Prefetch,
+                              prefetch_related_objects)
 from rest_framework import serializers, validators
 from rest_framework.validators import ValidationError
 from djoser.serializers import UserCreateSerializer, UserSerializer
 
-from api.fields import Base64ImageField
-from api.utils import create_recipe_record
+from api.fields import Base64ImageField, ImageSrcsetField
+from api.utils import (create_recipe_record, get_subscribed_author_ids,
+                       update_recipe_ingredients, update_recipe_tags)
 from recipes.models import (Ingredient, IngredientRecipe, Recipe, Tag,
                             UserFavoriteRecipe, UserShoppingRecipe)
+from recipes.pantry_index import recipe_composition_changed
 from users.models import Follow, User
 
+MAX_BULK_RECIPES = 500
+
 
 class CustomCreateUserSerializer(UserCreateSerializer):
     class Meta:
@@ -30,6 +36,21 @@ class UserCreateRetrieveSerializer(serializers.ModelSerializer):
                   'last_name')
 
 
+class SubscribedAuthorsListSerializer(serializers.ListSerializer):
+    """Перед сериализацией страницы проверяет подписки на всех ее
+    авторов одним запросом."""
+
+    def to_representation(self, data):
+        if isinstance(data, Manager):
+            data = data.all()
+        data = list(data)
+        get_subscribed_author_ids(
+            self.context['request'],
+            [self.child.get_author_id(item) for item in data]
+        )
+        return super().to_representation(data)
+
+
 class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
@@ -37,12 +58,15 @@ class CustomUserSerializer(UserSerializer):
         model = User
         fields = ('email', 'id', 'username', 'first_name',
                   'last_name', 'is_subscribed',)
+        list_serializer_class = SubscribedAuthorsListSerializer
+
+    @staticmethod
+    def get_author_id(obj):
+        return obj.id
 
     def get_is_subscribed(self, obj):
-        if self.context['request'].user.is_authenticated:
-            return Follow.objects.filter(user=self.context['request'].user,
-                                         author=obj).exists()
-        return False
+        return obj.id in get_subscribed_author_ids(self.context['request'],
+                                                   [obj.id])
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -62,8 +86,9 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class IngredientRecipeInputSerializer(serializers.Serializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(), source="ingredient_id")
+    # существование ингредиентов проверяется одним запросом
+    # в RecipeCreateSerializer.validate_ingredients
+    id = serializers.IntegerField(source='ingredient_id')
     amount = serializers.IntegerField()
 
     def validate_amount(self, value):
@@ -85,8 +110,7 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(many=True,
-                                              queryset=Tag.objects.all())
+    tags = serializers.ListField(child=serializers.IntegerField())
     ingredients = IngredientRecipeInputSerializer(many=True,
                                                   source='ingredientrecipe')
     image = Base64ImageField(required=False, allow_null=True)
@@ -107,6 +131,32 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
         ]
 
+    def validate_tags(self, value):
+        tags = Tag.objects.in_bulk(value)
+        missing = set(value) - tags.keys()
+        if missing:
+            raise ValidationError(f'Теги не найдены: {sorted(missing)}')
+        if len(tags) != len(value):
+            raise ValidationError('Теги не должны повторяться')
+        return [tags[tag_id] for tag_id in value]
+
+    def validate_ingredients(self, value):
+        ids = [item['ingredient_id'] for item in value]
+        found = set(
+            Ingredient.objects.filter(id__in=ids).values_list(
+                'id', flat=True
+            )
+        )
+        missing = set(ids) - found
+        if missing:
+            raise ValidationError(
+                f'Ингредиенты не найдены: {sorted(missing)}'
+            )
+        if len(found) != len(ids):
+            raise ValidationError('Ингредиенты не должны повторяться')
+        return value
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredientrecipe')
         tags = validated_data.pop('tags')
@@ -119,22 +169,35 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        super().update(instance, validated_data)
-        ingredients = validated_data.pop('ingredientrecipe')
-        tags = validated_data.pop('tags')
-
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-
-        create_recipe_record(
-            ingredients,
-            instance,
-            tags
-        )
+        ingredients = validated_data.pop('ingredientrecipe', None)
+        tags = validated_data.pop('tags', None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # версия увеличивается в том же UPDATE, что и поля рецепта
+        instance.revision = F('revision') + 1
         instance.save()
+        instance.refresh_from_db(fields=['revision'])
+
+        # пишутся только отличия от сохраненных ингредиентов и тегов
+        if ingredients is not None:
+            update_recipe_ingredients(instance, ingredients)
+        if tags is not None:
+            update_recipe_tags(instance, tags)
+        if ingredients is not None or tags is not None:
+            recipe_composition_changed(instance.pk)
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch('ingredientrecipe_set',
+                     queryset=IngredientRecipe.objects.select_related(
+                         'ingredient'
+                     ))
+        )
         return RecipeRetrieveSerializer(
             instance=instance,
             context={'request': self.context.get('request')}
@@ -149,6 +212,7 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
                                              many=True,
                                              read_only=True)
     image = Base64ImageField(required=False, allow_null=True)
+    image_srcset = ImageSrcsetField()
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
 
@@ -156,36 +220,68 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'ingredients', 'author',
                   'is_favorited', 'is_in_shopping_cart', 'name',
-                  'text', 'cooking_time', 'image',)
+                  'text', 'cooking_time', 'image', 'image_srcset',)
         lookup_field = 'name'
         extra_kwargs = {
             'url': {'lookup_field': 'name'}
         }
         depth = 2
+        list_serializer_class = SubscribedAuthorsListSerializer
+
+    @staticmethod
+    def get_author_id(obj):
+        return obj.author_id
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         if user.is_anonymous:
             return False
-        recipe = get_object_or_404(Recipe, id=obj.id)
-        return UserFavoriteRecipe.objects.filter(recipe=recipe,
+        return UserFavoriteRecipe.objects.filter(recipe=obj,
                                                  user=user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         if user.is_anonymous:
             return False
-        recipe = get_object_or_404(Recipe, id=obj.id)
-        return UserShoppingRecipe.objects.filter(recipe=recipe,
+        return UserShoppingRecipe.objects.filter(recipe=obj,
                                                  user=user).exists()
 
 
+class PantryRecipeSerializer(RecipeRetrieveSerializer):
+    missing_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeRetrieveSerializer.Meta):
+        fields = RecipeRetrieveSerializer.Meta.fields + ('missing_count',)
+
+
+class RecipeIdListSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES
+    )
+
+    def validate_recipes(self, value):
+        found = set(
+            Recipe.objects.filter(id__in=value).values_list('id', flat=True)
+        )
+        missing = set(value) - found
+        if missing:
+            raise ValidationError(f'Рецепты не найдены: {sorted(missing)}')
+        return found
+
+
 class ShortRecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField(required=False, allow_null=True)
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image', 'name', 'cooking_time')
+        fields = ('id', 'image', 'image_srcset', 'name', 'cooking_time')
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -198,7 +294,8 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     first_name = serializers.CharField(source='author.first_name')
     last_name = serializers.CharField(source='author.last_name')
     is_subscribed = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
+    recipes_count = serializers.IntegerField(source='author.recipes_count',
+                                             read_only=True)
 
     class Meta:
         model = Follow
@@ -206,8 +303,5 @@ class SubscriptionSerializer(serializers.ModelSerializer):
                   'last_name', 'is_subscribed', 'recipes',
                   'recipes_count')
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.user).count()
-
     def get_is_subscribed(self, obj):
         return True
@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework import routers
 
+from api_foodgram.metrics import metrics_view
 from api.views import (IngredientViewSet, RecipeViewSet, TagViewSet, UserApi,
                        subscribe)
 
@@ -22,6 +23,11 @@ router1.register(
 )
 
 urlpatterns = [
+    path(
+        '_metrics/',
+        metrics_view,
+        name='metrics'
+    ),
     path(
         'users/subscriptions/',
         UserApi.as_view(),
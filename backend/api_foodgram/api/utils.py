@@ -1,8 +1,12 @@
+from django.db.models import OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
 
-from recipes.models import IngredientRecipe, Recipe, Tag, TagRecipe
+from recipes.models import IngredientRecipe, Recipe, TagRecipe
+from recipes.pantry_index import recipe_composition_changed
+from recipes.shopping_list import recipe_amounts_changed
+from users.models import Follow
 
 
 def create_recipe_record(
@@ -10,34 +14,68 @@ def create_recipe_record(
         recipe,
         tags
 ):
-    ingredients_bulk = list()
-    for ingredient in ingredients:
-        ingredients_bulk.append(
-            IngredientRecipe(
-                ingredient=ingredient['ingredient_id'],
-                recipe=recipe,
-                amount=ingredient['amount']
-            )
-        )
     IngredientRecipe.objects.bulk_create(
-        ingredients_bulk,
-        batch_size=15,
-        ignore_conflicts=True
+        IngredientRecipe(
+            ingredient_id=ingredient['ingredient_id'],
+            recipe=recipe,
+            amount=ingredient['amount']
+        )
+        for ingredient in ingredients
+    )
+    TagRecipe.objects.bulk_create(
+        TagRecipe(tag=tag, recipe=recipe) for tag in tags
+    )
+    recipe_composition_changed(recipe.pk)
 
+
+def update_recipe_ingredients(recipe, ingredients):
+    """Приводит ингредиенты рецепта к переданным, меняя только
+    отличающиеся записи."""
+    stored = {
+        item.ingredient_id: item
+        for item in IngredientRecipe.objects.filter(recipe=recipe)
+    }
+    stored_amounts = {
+        ingredient_id: item.amount for ingredient_id, item in stored.items()
+    }
+    submitted = {
+        item['ingredient_id']: item['amount'] for item in ingredients
+    }
+    removed = stored.keys() - submitted.keys()
+    if removed:
+        IngredientRecipe.objects.filter(
+            recipe=recipe, ingredient_id__in=removed
+        ).delete()
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(ingredient_id=ingredient_id, recipe=recipe,
+                         amount=amount)
+        for ingredient_id, amount in submitted.items()
+        if ingredient_id not in stored
     )
-    tags_bulk = list()
-    for tag in tags:
-        cur_tag = get_object_or_404(Tag, id=tag.id)
-        tags_bulk.append(
-            TagRecipe(
-                tag=cur_tag,
-                recipe=recipe
-            )
+    changed = []
+    for ingredient_id, item in stored.items():
+        amount = submitted.get(ingredient_id, item.amount)
+        if amount != item.amount:
+            item.amount = amount
+            changed.append(item)
+    if changed:
+        IngredientRecipe.objects.bulk_update(changed, ['amount'])
+    recipe_amounts_changed(recipe.pk, stored_amounts, submitted)
+
+
+def update_recipe_tags(recipe, tags):
+    stored = set(
+        TagRecipe.objects.filter(recipe=recipe).values_list(
+            'tag_id', flat=True
         )
+    )
+    submitted = {tag.id for tag in tags}
+    removed = stored - submitted
+    if removed:
+        TagRecipe.objects.filter(recipe=recipe, tag_id__in=removed).delete()
     TagRecipe.objects.bulk_create(
-        tags_bulk,
-        batch_size=15,
-        ignore_conflicts=True
+        TagRecipe(tag_id=tag_id, recipe=recipe)
+        for tag_id in submitted - stored
     )
 
 
@@ -70,3 +108,55 @@ def add_or_delete_user_recipe_connection(
         user=user
     ).delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def get_subscribed_author_ids(request, author_ids):
+    """Те из author_ids, на кого подписан текущий пользователь.
+    Проверяются только авторы, еще не проверенные в этом запросе,
+    результат кешируется на объекте запроса."""
+    if not request.user.is_authenticated:
+        return set()
+    if not hasattr(request, '_subscribed_author_ids'):
+        request._checked_author_ids = set()
+        request._subscribed_author_ids = set()
+    author_ids = set(author_ids)
+    unchecked = author_ids - request._checked_author_ids
+    if unchecked:
+        request._subscribed_author_ids.update(
+            Follow.objects.filter(
+                user=request.user, author_id__in=unchecked
+            ).values_list('author_id', flat=True)
+        )
+        request._checked_author_ids |= unchecked
+    return request._subscribed_author_ids & author_ids
+
+
+def get_id_list(value):
+    """Список id из строки вида '1,2,3'; нечисловые значения
+    пропускаются."""
+    return [int(item) for item in (value or '').split(',')
+            if item.strip().isdigit()]
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None or not recipes_limit.isdigit():
+        return None
+    return int(recipes_limit)
+
+
+def prepare_subscriptions(queryset, recipes_limit=None):
+    """Подгружает авторов и первые recipes_limit рецептов каждого
+    автора фиксированным числом запросов."""
+    recipes = Recipe.objects.all()
+    if recipes_limit is not None:
+        # top-N рецептов на автора отбирается в базе коррелированным
+        # подзапросом, а не срезом в python
+        recipes = recipes.filter(pk__in=Subquery(
+            Recipe.objects.filter(
+                author=OuterRef('author')
+            ).order_by('-pub_date', '-id').values('pk')[:recipes_limit]
+        ))
+    return queryset.select_related('author').prefetch_related(
+        Prefetch('author__recipes', queryset=recipes)
+    )
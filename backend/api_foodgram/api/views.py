@@ -1,25 +1,47 @@
-import weasyprint
-from django.http import HttpResponse
+import os
+
+from django.conf import settings
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch, Value,
+                              prefetch_related_objects)
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
+from django.utils.cache import patch_vary_headers
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from api.pagination import RecipePagination
+from api.etags import etag_matches, get_recipe_etag, get_recipe_page_etag
+from api.pagination import (FeedPagination, RecipeCursorPagination,
+                            RecipePagination)
 from api.mixins import BaseGetView
-from api.serializers import (IngredientSerializer, RecipeCreateSerializer,
+from api.renderers import (CSVRenderer, JSONStreamRenderer, PDFRenderer,
+                           TextRenderer)
+from api.serializers import (IngredientSerializer, PantryRecipeSerializer,
+                             RecipeCreateSerializer, RecipeIdListSerializer,
                              RecipeRetrieveSerializer, ShortRecipeSerializer,
                              SubscriptionSerializer, TagSerializer)
-from api.utils import add_or_delete_user_recipe_connection
-from recipes.collect_pdf import collect_shopping_pdf
+from api.utils import (add_or_delete_user_recipe_connection, get_id_list,
+                       get_recipes_limit, prepare_subscriptions)
 from recipes.filters import RecipeFilter
-from recipes.models import (Ingredient, Recipe, Tag, UserFavoriteRecipe,
-                            UserShoppingRecipe)
+from recipes.models import (Ingredient, IngredientRecipe, Recipe, Tag,
+                            UserFavoriteRecipe, UserShoppingRecipe)
+from recipes.collect_pdf import (get_shopping_cart_ingredients,
+                                 stream_shopping_csv, stream_shopping_json,
+                                 stream_shopping_txt)
+from recipes.feed import get_feed_positions
+from recipes.ingredient_index import (DEFAULT_LIMIT, MAX_LIMIT,
+                                      ingredient_index)
+from recipes.pantry_index import DEFAULT_MAX_MISSING, pantry_index
+from recipes.pdf_cache import get_shopping_cart_pdf
+from recipes.search import search_recipes
+from recipes.similarity import get_similar_recipes
+from recipes.user_recipes import add_user_recipes, delete_user_recipes
 from recipes.permissions import (FavoritesIsAuthenticated,
                                  RecipeIsAuthenticated,
                                  ShoppingCartIsAuthenticated,
@@ -36,14 +58,185 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
     search_fields = ('tags',)
 
+    @property
+    def paginator(self):
+        if (not hasattr(self, '_paginator')
+                and RecipeCursorPagination.cursor_query_param
+                in self.request.query_params):
+            self._paginator = RecipeCursorPagination()
+        return super().paginator
+
+    @staticmethod
+    def get_prefetches():
+        return (
+            'tags',
+            Prefetch(
+                'ingredientrecipe_set',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+
+    def get_queryset(self):
+        if self.action not in ('list', 'retrieve', 'search', 'feed',
+                               'pantry',):
+            return Recipe.objects.all()
+        # все связанные данные и флаги пользователя загружаются заранее,
+        # поэтому число запросов не зависит от размера страницы
+        queryset = Recipe.objects.select_related('author')
+        if self.action != 'list':
+            # список загружает теги и ингредиенты после проверки ETag
+            queryset = queryset.prefetch_related(*self.get_prefetches())
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False,
+                                          output_field=BooleanField())
+            )
+        return queryset.annotate(
+            is_favorited=Exists(UserFavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(UserShoppingRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+        )
+
     def get_serializer_class(self):
-        if self.action in ('retrieve', 'list',):
+        if self.action in ('retrieve', 'list', 'search', 'feed',):
             return RecipeRetrieveSerializer
         return RecipeCreateSerializer
 
+    def list(self, request, *args, **kwargs):
+        # ETag считается по строкам загруженной страницы
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        paginator = self.paginator
+        page_info = [paginator.get_next_link(),
+                     paginator.get_previous_link()]
+        if not isinstance(paginator, RecipeCursorPagination):
+            # пагинация по ключу не считает COUNT
+            page_info.append(paginator.page.paginator.count)
+        etag = get_recipe_page_etag(request, page, *page_info)
+        return self.conditional_response(etag, self.get_page_response,
+                                         request, page)
+
+    def get_page_response(self, request, page):
+        prefetch_related_objects(page, *self.get_prefetches())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        etag = None
+        if str(kwargs['pk']).isdigit():
+            etag = get_recipe_etag(Recipe.objects.all(), kwargs['pk'],
+                                   request.user)
+        if etag is None:
+            raise Http404
+        return self.conditional_response(etag, super().retrieve,
+                                         request, *args, **kwargs)
+
+    def conditional_response(self, etag, handler, request, *args, **kwargs):
+        # при совпадении версии сериализатор не запускается
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def finalize_response(self, request, response, *args, **kwargs):
+        # ошибки выгрузки списка покупок отдаются в json,
+        # а не в формате запрошенного файла
+        if (getattr(response, 'exception', False)
+                and self.action == 'get_shopping_cart'):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    @action(detail=False, methods=('get',))
+    def search(self, request, **kwargs):
+        # полнотекстовый поиск сочетается с фильтрами RecipeFilter
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'q': ['Обязательный параметр.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        queryset = search_recipes(
+            self.filter_queryset(self.get_queryset()),
+            query
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=('get',))
+    def pantry(self, request, **kwargs):
+        # рецепты подбираются по индексу в памяти, из базы читается
+        # только текущая страница
+        ingredient_ids = get_id_list(request.query_params.get('ingredients'))
+        if not ingredient_ids:
+            return Response({'ingredients': ['Обязательный параметр.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        max_missing = request.query_params.get('max_missing', '')
+        matches = pantry_index.match(
+            ingredient_ids,
+            tag_slugs=request.query_params.getlist('tags'),
+            max_missing=(int(max_missing) if max_missing.isdigit()
+                         else DEFAULT_MAX_MISSING)
+        )
+        page = dict(self.paginate_queryset(matches))
+        recipes = self.get_queryset().in_bulk(list(page))
+        # рецепт мог быть удален после построения индекса
+        page_recipes = []
+        for recipe_id, missing_count in page.items():
+            if recipe_id in recipes:
+                recipes[recipe_id].missing_count = missing_count
+                page_recipes.append(recipes[recipe_id])
+        serializer = PantryRecipeSerializer(
+            page_recipes,
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=('get',))
+    def similar(self, request, **kwargs):
+        # список готов заранее: update_similar_recipes
+        if not str(kwargs['pk']).isdigit():
+            raise Http404
+        recipes = get_similar_recipes(kwargs['pk'])
+        if not recipes:
+            get_object_or_404(Recipe, pk=kwargs['pk'])
+        serializer = ShortRecipeSerializer(recipes, many=True,
+                                           context={'request': request})
+        return Response(serializer.data)
+
+    @action(detail=False,
+            methods=('get',),
+            permission_classes=[IsAuthenticated, ])
+    def feed(self, request, **kwargs):
+        # страница ленты берется из записей FeedEntry и рецептов
+        # популярных авторов, затем рецепты загружаются по id
+        paginator = FeedPagination()
+        positions = paginator.paginate_positions(
+            request,
+            lambda position, limit: get_feed_positions(
+                request.user, position, limit
+            )
+        )
+        recipes = self.get_queryset().filter(
+            id__in=[recipe_id for _, recipe_id in positions]
+        ).order_by('-pub_date', '-id')
+        serializer = self.get_serializer(recipes, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=True,
             methods=('post', 'delete'),
             permission_classes=[IsAuthenticated,
@@ -57,21 +250,67 @@ class RecipeViewSet(viewsets.ModelViewSet):
             pk=kwargs['pk']
         )
 
+    def change_user_recipes(self, request, connection_model):
+        # список id проверяется одним запросом, записи добавляются
+        # и удаляются пакетом: число запросов не зависит от размера списка
+        serializer = RecipeIdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        change = (add_user_recipes if request.method == 'POST'
+                  else delete_user_recipes)
+        recipe_ids = change(connection_model, request.user.pk,
+                            serializer.validated_data['recipes'])
+        return Response({'recipes': sorted(recipe_ids)})
+
+    @action(detail=False,
+            methods=('post', 'delete'),
+            url_path='favorite',
+            url_name='bulk-favorite',
+            permission_classes=[IsAuthenticated,
+                                FavoritesIsAuthenticated, ])
+    def bulk_favorite(self, request, **kwargs):
+        return self.change_user_recipes(request, UserFavoriteRecipe)
+
     @action(detail=False,
             methods=('get',),
             url_path='download_shopping_cart',
             permission_classes=[IsAuthenticated,
-                                ShoppingCartIsAuthenticated, ])
+                                ShoppingCartIsAuthenticated, ],
+            renderer_classes=[PDFRenderer, TextRenderer, CSVRenderer,
+                              JSONStreamRenderer, ])
     def get_shopping_cart(self, request, **kwargs):
         user = self.request.user
-        shopping_cart_html = collect_shopping_pdf(user)
-        shopping_cart_pdf = weasyprint.HTML(
-            file_obj=shopping_cart_html
-        ).write_pdf()
+        # формат выбирается по ?format= или заголовку Accept,
+        # по умолчанию отдается pdf
+        renderer = request.accepted_renderer
+        if renderer.format != PDFRenderer.format:
+            streams = {
+                TextRenderer.format: stream_shopping_txt,
+                CSVRenderer.format: stream_shopping_csv,
+                JSONStreamRenderer.format: stream_shopping_json,
+            }
+            response = StreamingHttpResponse(
+                streams[renderer.format](get_shopping_cart_ingredients(user)),
+                content_type=renderer.media_type + '; charset=utf-8'
+            )
+            response['Content-Disposition'] = (
+                'attachment; filename="shopping_card.'
+                + renderer.format + '"'
+            )
+            return response
+
+        shopping_cart_path = get_shopping_cart_pdf(user)
         filename = "shopping_card.pdf"
 
-        response = HttpResponse(shopping_cart_pdf,
-                                content_type='application/pdf')
+        if settings.SHOPPING_CART_ACCEL_REDIRECT:
+            # файл отдает nginx, django не читает его содержимое
+            response = HttpResponse(content_type='application/pdf')
+            response['X-Accel-Redirect'] = (
+                settings.SHOPPING_CART_ACCEL_REDIRECT
+                + os.path.basename(shopping_cart_path)
+            )
+        else:
+            response = FileResponse(open(shopping_cart_path, 'rb'),
+                                    content_type='application/pdf')
         response['Content-Disposition'] = ('attachment; filename="'
                                            + filename + '"')
         return response
@@ -89,6 +328,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
             pk=kwargs['pk']
         )
 
+    @action(detail=False,
+            methods=('post', 'delete'),
+            url_path='shopping_cart',
+            url_name='bulk-shopping-cart',
+            permission_classes=[IsAuthenticated,
+                                ShoppingCartIsAuthenticated, ])
+    def bulk_shopping_cart(self, request, **kwargs):
+        return self.change_user_recipes(request, UserShoppingRecipe)
+
 
 class TagViewSet(BaseGetView):
     permission_classes = [TagIngredientPermission]
@@ -102,29 +350,39 @@ class IngredientViewSet(BaseGetView):
     pagination_class = None
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (filters.SearchFilter, )
-    # filterset_fields = ('name',)
-    search_fields = ('name',)
+
+    def list(self, request, *args, **kwargs):
+        # поиск идет по индексу в памяти процесса, база читается только
+        # для сверки версии индекса
+        name = request.query_params.get('name')
+        if name is None:
+            return Response(ingredient_index.all())
+        limit = request.query_params.get('limit', '')
+        limit = (min(int(limit), MAX_LIMIT) if limit.isdigit()
+                 else DEFAULT_LIMIT)
+        return Response(ingredient_index.search(name, limit))
 
 
 class UserApi(APIView):
     permission_classes = [UsersPermission, IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = RecipePagination
 
     def get(self, request):
-        paginator = PageNumberPagination()
+        paginator = self.pagination_class()
 
         user = self.request.user
-        subscription_list = Follow.objects.filter(
-            user=user
-        ).select_related('author')
+        subscription_list = prepare_subscriptions(
+            Follow.objects.filter(user=user).order_by('id'),
+            get_recipes_limit(request)
+        )
+        # пагинация применяется к queryset до сериализации
+        result_page = paginator.paginate_queryset(subscription_list, request)
         serializer = SubscriptionSerializer(
-            subscription_list,
+            result_page,
             context={'request': request},
             many=True
         )
-        result_page = paginator.paginate_queryset(serializer.data, request)
-        return paginator.get_paginated_response(result_page)
+        return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['POST', 'DELETE', ])
@@ -140,6 +398,10 @@ def subscribe(request, user_id):
             user=user,
             author=author
         )
+        subscription = prepare_subscriptions(
+            Follow.objects.filter(pk=subscription.pk),
+            get_recipes_limit(request)
+        ).get()
         serializer = SubscriptionSerializer(
             subscription,
             context={'request': request},
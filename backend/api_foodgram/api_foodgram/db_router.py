@@ -0,0 +1,88 @@
+"""
+Чтение с реплики базы данных.
+
+Запросы GET, HEAD и OPTIONS читают с реплики REPLICA_DB_ALIAS, всё
+остальное (запись, management-команды, фоновые потоки) идет в основную
+базу. После запроса на запись пользователь на DB_REPLICA_PIN_SECONDS
+закрепляется за основной базой - cookie и меткой в кеше по заголовку
+Authorization, - чтобы сразу после записи не прочитать с отстающей
+реплики старые данные (например, is_favorited). Метку видят все процессы,
+только если кеш общий (CACHE_LOCATION), иначе клиентов без cookie
+закрепляет лишь процесс, принявший запись.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_DB_ALIAS = 'replica'
+PIN_COOKIE_NAME = 'use_primary_db'
+PIN_CACHE_KEY = 'use_primary_db_{}'
+
+state = threading.local()
+
+
+def get_pin_cache_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return PIN_CACHE_KEY.format(
+        hashlib.sha1(authorization.encode()).hexdigest()
+    )
+
+
+def is_pinned(request):
+    if PIN_COOKIE_NAME in request.COOKIES:
+        return True
+    key = get_pin_cache_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # связанные объекты читаются из той же базы
+            return instance._state.db
+        if getattr(state, 'use_replica', False):
+            return REPLICA_DB_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплика - копия основной базы
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # реплика получает схему через репликацию
+        return db != REPLICA_DB_ALIAS
+
+
+class ReplicaPinMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        state.use_replica = safe and not is_pinned(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            state.use_replica = False
+        if not safe:
+            self.pin(request, response)
+        return response
+
+    def pin(self, request, response):
+        timeout = settings.DB_REPLICA_PIN_SECONDS
+        response.set_cookie(PIN_COOKIE_NAME, '1', max_age=timeout,
+                            httponly=True, samesite='Lax')
+        key = get_pin_cache_key(request)
+        if key is not None:
+            cache.set(key, 1, timeout=timeout)
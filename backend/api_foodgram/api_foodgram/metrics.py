@@ -0,0 +1,248 @@
+"""
+Метрики запросов: число запросов к базе, время в базе, повторяющиеся
+запросы и время обработки.
+
+Замеряется доля REQUEST_METRICS_SAMPLE_RATE запросов; при нулевой доле
+middleware отключается при старте и ничего не стоит. Замеренный запрос
+получает заголовок Server-Timing, а его значения попадают в гистограммы
+по маршрутам в памяти процесса, которые отдает /api/_metrics/ в
+текстовом формате Prometheus. Замеренные запросы дольше
+REQUEST_METRICS_SLOW_MS пишутся в лог вместе с SQL.
+
+Тело потокового ответа формируется уже после выхода из view, и запросы
+к базе идут при его чтении. Поэтому такой ответ попадает в гистограммы
+после передачи последней части, а в заголовке Server-Timing, который
+отправляется раньше тела, - только время до начала передачи.
+"""
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.http import FileResponse, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger('api_foodgram.slow_requests')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+HISTOGRAMS = (
+    ('foodgram_request_duration_seconds', DURATION_BUCKETS, 'total'),
+    ('foodgram_request_view_seconds', DURATION_BUCKETS, 'view'),
+    ('foodgram_request_db_seconds', DURATION_BUCKETS, 'db'),
+    ('foodgram_request_queries', QUERY_BUCKETS, 'queries'),
+)
+DUPLICATES_METRIC = 'foodgram_request_duplicate_queries_total'
+
+state = threading.local()
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # последняя ячейка - значения больше всех границ
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name, labels):
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {total}')
+        return lines
+
+
+class Registry:
+    """Гистограммы по маршрутам, общие для всех потоков процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = defaultdict(dict)
+        self.duplicates = Counter()
+
+    def observe(self, route, method, values):
+        labels = (route, method)
+        with self.lock:
+            for name, buckets, key in HISTOGRAMS:
+                histogram = self.histograms[name].get(labels)
+                if histogram is None:
+                    histogram = self.histograms[name][labels] = Histogram(
+                        buckets
+                    )
+                histogram.observe(values[key])
+            self.duplicates[labels] += values['duplicates']
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, _, _ in HISTOGRAMS:
+                lines.append(f'# TYPE {name} histogram')
+                for (route, method), histogram in sorted(
+                        self.histograms[name].items()):
+                    lines.extend(histogram.render(
+                        name, f'route="{route}",method="{method}"'
+                    ))
+            lines.append(f'# TYPE {DUPLICATES_METRIC} counter')
+            for (route, method), count in sorted(self.duplicates.items()):
+                lines.append(f'{DUPLICATES_METRIC}'
+                             f'{{route="{route}",method="{method}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = None
+        self.end = None
+        self.queries = []
+        self.spans = defaultdict(float)
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, time.perf_counter() - start))
+
+    def get_values(self):
+        total = self.end - self.start
+        seen = Counter((sql, str(params)) for sql, params, _ in self.queries)
+        return {
+            'total': total,
+            'view': (self.end - self.view_start
+                     if self.view_start is not None else total),
+            'db': sum(duration for _, _, duration in self.queries),
+            'queries': len(self.queries),
+            'duplicates': sum(count - 1 for count in seen.values()),
+        }
+
+
+@contextmanager
+def measure(name):
+    """Добавляет время блока в Server-Timing замеряемого запроса."""
+    metrics = getattr(state, 'metrics', None)
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.spans[name] += time.perf_counter() - start
+
+
+def get_server_timing(values, spans):
+    parts = [
+        f'db;dur={values["db"] * 1000:.1f};desc="{values["queries"]} '
+        f'queries, {values["duplicates"]} duplicate"',
+        f'view;dur={values["view"] * 1000:.1f}',
+    ]
+    parts.extend(f'{name};dur={duration * 1000:.1f}'
+                 for name, duration in spans.items())
+    parts.append(f'total;dur={values["total"] * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def log_slow_request(request, values, queries):
+    logger.warning(
+        '%s %s: %.0f ms, %d queries (%d duplicate), db %.0f ms\n%s',
+        request.method, request.get_full_path(), values['total'] * 1000,
+        values['queries'], values['duplicates'], values['db'] * 1000,
+        '\n'.join(f'{duration * 1000:.1f} ms: {sql} {params!r}'
+                  for sql, params, duration in queries)
+    )
+
+
+@contextmanager
+def capture(metrics):
+    """Считает запросы к базе всех подключений потока в metrics."""
+    state.metrics = metrics
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.execute)
+                )
+            yield
+    finally:
+        state.metrics = None
+
+
+class RequestMetricsMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        with capture(metrics):
+            response = self.get_response(request)
+        metrics.end = time.perf_counter()
+        values = metrics.get_values()
+        response['Server-Timing'] = get_server_timing(values, metrics.spans)
+        # файл читается с диска без запросов к базе
+        if response.streaming and not isinstance(response, FileResponse):
+            response.streaming_content = self.stream(
+                request, response.streaming_content, metrics
+            )
+        else:
+            self.report(request, values, metrics)
+        return response
+
+    def stream(self, request, content, metrics):
+        try:
+            with capture(metrics):
+                yield from content
+        finally:
+            metrics.end = time.perf_counter()
+            self.report(request, metrics.get_values(), metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(state, 'metrics', None)
+        if metrics is not None:
+            metrics.view_start = time.perf_counter()
+
+    def report(self, request, values, metrics):
+        match = request.resolver_match
+        registry.observe(match.view_name if match else 'unresolved',
+                         request.method, values)
+        slow = settings.REQUEST_METRICS_SLOW_MS
+        if slow and values['total'] * 1000 >= slow:
+            log_slow_request(request, values, metrics.queries)
+
+
+def metrics_view(request):
+    token = settings.REQUEST_METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+        )
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        raise PermissionDenied
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
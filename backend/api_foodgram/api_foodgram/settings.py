@@ -40,6 +40,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api_foodgram.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -82,6 +83,45 @@ DATABASES = {
     }
 }
 
+# реплика для чтения: запросы GET читают с нее, см. api_foodgram/db_router.py
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST', default='')
+DB_REPLICA_NAME = os.getenv('DB_REPLICA_NAME', default='')
+# сколько секунд после записи пользователь читает из основной базы
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', default=10))
+if DB_REPLICA_HOST or DB_REPLICA_NAME:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': DB_REPLICA_NAME or DATABASES['default']['NAME'],
+        'HOST': DB_REPLICA_HOST or DATABASES['default']['HOST'],
+        'PORT': os.getenv('DB_REPLICA_PORT',
+                          default=DATABASES['default']['PORT']),
+    }
+    DATABASE_ROUTERS = ['api_foodgram.db_router.ReplicaRouter']
+    MIDDLEWARE.insert(2, 'api_foodgram.db_router.ReplicaPinMiddleware')
+
+# общий для процессов кеш (memcached, host:port): в нем метки закрепления
+# за основной базой после записи и, при AUTH_TOKEN_CACHE_ALIAS=default,
+# токены; без него у каждого процесса свой кеш в памяти
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', default='')
+if CACHE_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': CACHE_LOCATION,
+        }
+    }
+
+# метрики запросов, см. api_foodgram/metrics.py: доля замеряемых
+# запросов, при 0 middleware отключается
+REQUEST_METRICS_SAMPLE_RATE = float(os.getenv('REQUEST_METRICS_SAMPLE_RATE',
+                                              default=0))
+# замеренные запросы дольше стольких миллисекунд пишутся в лог с SQL,
+# 0 - не пишутся
+REQUEST_METRICS_SLOW_MS = int(os.getenv('REQUEST_METRICS_SLOW_MS', default=0))
+# токен для /api/_metrics/ в заголовке Authorization: Bearer <токен>;
+# без токена метрики доступны только staff
+REQUEST_METRICS_TOKEN = os.getenv('REQUEST_METRICS_TOKEN', default='')
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -119,9 +159,60 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 # хранилище медиа пользователей
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# файлы называются по хешу содержимого, повторные загрузки не дублируются
+DEFAULT_FILE_STORAGE = 'recipes.storage.ContentHashStorage'
+# сколько секунд недавно использованный файл нельзя удалять
+MEDIA_BLOB_GRACE_PERIOD = 60 * 60
+
+# индексы в памяти процессов (ингредиенты, кладовая) сверяют свою версию
+# с версией в базе не чаще раза в столько секунд
+INDEX_VERSION_CHECK_SECONDS = float(os.getenv('INDEX_VERSION_CHECK_SECONDS',
+                                              default=2))
+
+# число потоков для генерации уменьшенных копий картинок рецептов
+IMAGE_DERIVATIVE_WORKERS = int(os.getenv('IMAGE_DERIVATIVE_WORKERS',
+                                         default=2))
+
+# кеш сгенерированных pdf со списками покупок
+SHOPPING_CART_CACHE_DIR = os.path.join(BASE_DIR, 'shopping_cart_cache')
+SHOPPING_CART_CACHE_MAX_SIZE = int(os.getenv(
+    'SHOPPING_CART_CACHE_MAX_SIZE', default=100 * 1024 * 1024
+))
+# префикс internal location nginx; если пуст, pdf отдает django
+SHOPPING_CART_ACCEL_REDIRECT = os.getenv('SHOPPING_CART_ACCEL_REDIRECT',
+                                         default='')
+
+# лента подписок: новые рецепты раскладываются по лентам подписчиков
+# в фоновых потоках пакетами по FEED_FANOUT_BATCH_SIZE записей
+FEED_FANOUT_WORKERS = int(os.getenv('FEED_FANOUT_WORKERS', default=1))
+FEED_FANOUT_BATCH_SIZE = 1000
+# рецепты авторов с большим числом подписчиков не раскладываются,
+# а подмешиваются в ленту при чтении
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS',
+                                          default=5000))
+# сколько последних рецептов автора попадает в ленту при подписке
+FEED_BACKFILL_SIZE = 50
+
+# рейтинг trending: за сколько часов вклад добавления в избранное
+# или корзину уменьшается вдвое
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS',
+                                           default=72))
+
+# сколько похожих рецептов хранится для каждого рецепта
+SIMILAR_RECIPES_COUNT = 10
 
 AUTH_USER_MODEL = 'users.User'
 
+# кеш токенов аутентификации, см. users/authentication.py: общий кеш
+# django и время жизни записи в нем; без общего кеша - размер LRU процесса
+# и время жизни записи в нем, за которое другие процессы могут не узнать
+# о выходе пользователя
+AUTH_TOKEN_CACHE_ALIAS = os.getenv('AUTH_TOKEN_CACHE_ALIAS', default='')
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', default=60))
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_LOCAL_CACHE_TTL = int(os.getenv('AUTH_TOKEN_LOCAL_CACHE_TTL',
+                                           default=5))
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
@@ -130,7 +221,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
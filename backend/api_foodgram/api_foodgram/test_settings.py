@@ -0,0 +1,30 @@
+"""
+Настройки для pytest: SQLite вместо PostgreSQL и временные каталоги для
+файлов.
+"""
+import tempfile
+
+from api_foodgram.settings import *  # noqa: F401,F403
+from api_foodgram.settings import BASE_DIR, os
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'test.sqlite3'),
+    },
+    # у реплики своя тестовая база, чтобы было видно, откуда прочитаны
+    # данные; роутер и middleware включают тесты маршрутизации
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'test_replica.sqlite3'),
+    },
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram_media_')
+SHOPPING_CART_CACHE_DIR = tempfile.mkdtemp(prefix='foodgram_pdf_')
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# версии индексов сверяются с базой при каждом обращении
+INDEX_VERSION_CHECK_SECONDS = 0
@@ -1,7 +1,18 @@
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.db import DatabaseError
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_foodgram.settings')
 
 application = get_wsgi_application()
+
+# индекс продуктов строится при старте воркера, а не на первом запросе
+from recipes.pantry_index import pantry_index  # noqa: E402
+
+try:
+    pantry_index.ensure_fresh()
+except DatabaseError:
+    # база еще не готова (например, до миграций): индекс построится
+    # при первом запросе
+    pass
@@ -1,26 +1,41 @@
 from django.contrib import admin
-from django.db.models import Count
 
 from recipes.models import (Ingredient, IngredientRecipe, Recipe, Tag,
                             TagRecipe, UserFavoriteRecipe, UserShoppingRecipe)
+from recipes.pantry_index import recipe_composition_changed
+from recipes.shopping_list import get_recipe_amounts, recipe_amounts_changed
+
+
+class IngredientRecipeInline(admin.TabularInline):
+    model = IngredientRecipe
+    extra = 1
+
+
+class TagRecipeInline(admin.TabularInline):
+    model = TagRecipe
+    extra = 1
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Создание объекта для настройки параметров админки."""
-    list_display = ('id', 'name', 'author', 'get_recipes_count')
+    list_display = ('id', 'name', 'author', 'favorites_count')
+    inlines = (IngredientRecipeInline, TagRecipeInline)
     search_fields = ('text',)
     list_filter = ('author', 'name', 'tags', )
     empty_value_display = '-пусто-'
 
-    def get_recipes_count(self, obj):
-        return obj.recipes_count
-    get_recipes_count.short_description = 'Добавление рецепта в избранное'
-
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            recipes_count=Count("favorite_recipes"),
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        recipe_composition_changed(recipe.pk)
+        if not change:
+            return super().save_related(request, form, formsets, change)
+        amounts = get_recipe_amounts(recipe.pk)
+        super().save_related(request, form, formsets, change)
+        recipe_amounts_changed(
+            recipe.pk, amounts, get_recipe_amounts(recipe.pk)
         )
+        recipe.bump_revision()
 
 
 @admin.register(Ingredient)
@@ -31,8 +46,23 @@ class IngredientAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Связи рецептов меняются только через рецепт: RecipeAdmin и API
+    обновляют вместе с ними списки покупок, индекс продуктов и версию
+    рецепта."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(IngredientRecipe)
-class IngredientRecipeAdmin(admin.ModelAdmin):
+class IngredientRecipeAdmin(ReadOnlyAdmin):
     empty_value_display = '-пусто-'
     list_display = ('amount', 'get_recipe', 'get_ingredient')
 
@@ -56,7 +86,7 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(TagRecipe)
-class TagRecipeAdmin(admin.ModelAdmin):
+class TagRecipeAdmin(ReadOnlyAdmin):
     empty_value_display = '-пусто-'
     list_display = ('get_recipe', 'get_tag')
 
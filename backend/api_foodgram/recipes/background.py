@@ -0,0 +1,26 @@
+"""
+Фоновые задачи в пулах потоков процесса.
+
+Задача ставится в пул после коммита транзакции. Результат задачи никто
+не ждет, поэтому ошибка пишется в лог, а не теряется в future. После
+задачи соединение потока с базой закрывается: у каждого потока пула оно
+свое.
+"""
+import logging
+
+from django.db import connection, transaction
+
+logger = logging.getLogger('recipes.background')
+
+
+def run_task(task, *args):
+    try:
+        task(*args)
+    except Exception:
+        logger.exception('Ошибка фоновой задачи %s%r', task.__name__, args)
+    finally:
+        connection.close()
+
+
+def run_in_background(executor, task, *args):
+    transaction.on_commit(lambda: executor.submit(run_task, task, *args))
@@ -1,15 +1,21 @@
-from django.db.models import Sum
+import csv
+import json
+
 from django.template.loader import render_to_string
 
-from recipes.models import IngredientRecipe
+from recipes.models import ShoppingListItem
+
+
+def get_shopping_cart_ingredients(user):
+    # суммы хранятся готовыми, см. recipes.shopping_list
+    return ShoppingListItem.objects.filter(user=user).values(
+        'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+    ).order_by('ingredient__name')
 
 
-def collect_shopping_pdf(user):
-    ingredients = IngredientRecipe.objects.filter(
-        recipe__shopping_recipes__user=user
-    ).values(
-        'ingredient__name', 'ingredient__measurement_unit'
-    ).annotate(Sum('amount')).order_by()
+def collect_shopping_pdf(user, ingredients=None):
+    if ingredients is None:
+        ingredients = get_shopping_cart_ingredients(user)
 
     return render_to_string(
         'pdf_template.html',
@@ -18,3 +24,46 @@ def collect_shopping_pdf(user):
             'shopping_cart': ingredients
         }
     )
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def stream_shopping_txt(ingredients):
+    for ingredient in ingredients.iterator():
+        yield (f'{ingredient["ingredient__name"]} '
+               f'({ingredient["ingredient__measurement_unit"]}) - '
+               f'{ingredient["total_amount"]}\n')
+
+
+def stream_shopping_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in ingredients.iterator():
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['total_amount']
+        ))
+
+
+def stream_shopping_json(ingredients):
+    yield '['
+    separator = ''
+    for ingredient in ingredients.iterator():
+        yield separator + json.dumps(
+            {
+                'name': ingredient['ingredient__name'],
+                'measurement_unit': ingredient[
+                    'ingredient__measurement_unit'
+                ],
+                'amount': ingredient['total_amount']
+            },
+            ensure_ascii=False
+        )
+        separator = ','
+    yield ']'
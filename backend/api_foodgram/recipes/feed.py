@@ -0,0 +1,154 @@
+"""
+Лента рецептов авторов, на которых подписан пользователь.
+
+Новый рецепт после коммита раскладывается в FeedEntry всех подписчиков
+автора в фоновом потоке, пакетами. Рецепты авторов, у которых больше
+FEED_FANOUT_MAX_FOLLOWERS подписчиков, не раскладываются: они читаются
+из рецептов таких авторов и сливаются с записями ленты при запросе.
+Обе выборки идут по индексам, поэтому время чтения не зависит от числа
+подписок. Когда после отписки подписчиков у автора не больше
+FEED_FANOUT_MAX_FOLLOWERS, а его новый рецепт есть не во всех лентах,
+последние рецепты раскладываются заново: вышедшие выше порога в ленты
+не попадали.
+"""
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from recipes.background import run_in_background
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow, User
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.FEED_FANOUT_WORKERS,
+    thread_name_prefix='recipe-feed'
+)
+
+
+def is_fanned_out(author):
+    return author.followers_count <= settings.FEED_FANOUT_MAX_FOLLOWERS
+
+
+def add_to_followers_feeds(author_id, recipes):
+    """Добавляет рецепты [(id, pub_date)] в ленты всех подписчиков
+    автора пакетами."""
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).order_by('id').values_list('user_id', flat=True).iterator()
+    while True:
+        batch = list(islice(follower_ids, settings.FEED_FANOUT_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                       author_id=author_id, pub_date=pub_date)
+             for user_id in batch
+             for recipe_id, pub_date in recipes),
+            batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+
+def fan_out_recipe(recipe_id):
+    """Добавляет рецепт в ленты всех подписчиков автора."""
+    recipe = Recipe.objects.select_related('author').filter(
+        pk=recipe_id
+    ).first()
+    if recipe is None or not is_fanned_out(recipe.author):
+        return
+    add_to_followers_feeds(recipe.author_id, [(recipe.pk, recipe.pub_date)])
+
+
+def get_latest_recipes(author_id):
+    return Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+
+
+def restore_author_feeds(author_id):
+    """Раскладывает последние рецепты автора, если после отписки число
+    его подписчиков не выше порога. Параллельные отписки могут
+    перескочить порог, поэтому проверяется не равенство, а то, дошел ли
+    новый рецепт автора до всех подписчиков; повторный вызов ничего
+    не меняет."""
+    author = User.objects.filter(
+        pk=author_id,
+        followers_count__lte=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).first()
+    if author is None:
+        return
+    recipes = list(get_latest_recipes(author_id))
+    if not recipes or FeedEntry.objects.filter(
+            recipe_id=recipes[0][0]).count() >= author.followers_count:
+        return
+    add_to_followers_feeds(author_id, recipes)
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки."""
+    if not Follow.objects.filter(user_id=user_id, author_id=author_id,
+                                 author__followers_count__lte=(
+                                     settings.FEED_FANOUT_MAX_FOLLOWERS
+                                 )).exists():
+        return
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                   author_id=author_id, pub_date=pub_date)
+         for recipe_id, pub_date in get_latest_recipes(author_id)),
+        ignore_conflicts=True
+    )
+
+
+def schedule_fan_out(recipe):
+    run_in_background(executor, fan_out_recipe, recipe.pk)
+
+
+def schedule_backfill(follow):
+    run_in_background(executor, backfill_feed, follow.user_id,
+                      follow.author_id)
+
+
+def schedule_restore(follow):
+    # счетчик подписчиков уже изменен: задача идет после коммита
+    run_in_background(executor, restore_author_feeds, follow.author_id)
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def before(position, date_field, id_field):
+    if position is None:
+        return Q()
+    pub_date, recipe_id = position
+    return (Q(**{f'{date_field}__lt': pub_date})
+            | Q(**{date_field: pub_date, f'{id_field}__lt': recipe_id}))
+
+
+def get_feed_positions(user, position, limit):
+    """Позиции (pub_date, id рецепта) ленты пользователя после
+    position, по убыванию."""
+    entries = FeedEntry.objects.filter(
+        before(position, 'pub_date', 'recipe_id'), user=user
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[:limit]
+    merged = Recipe.objects.filter(
+        before(position, 'pub_date', 'id'),
+        author__in=Follow.objects.filter(
+            user=user,
+            author__followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).values('author_id')
+    ).order_by('-pub_date', '-id').values_list('pub_date', 'id')[:limit]
+    positions = []
+    # автор мог перейти порог уже после раскладки: рецепт встретится
+    # в обеих выборках
+    for item in heapq.merge(list(entries), list(merged), reverse=True):
+        if not positions or positions[-1] != item:
+            positions.append(item)
+        if len(positions) == limit:
+            break
+    return positions
@@ -1,8 +1,10 @@
-from django_filters.rest_framework import (BooleanFilter, FilterSet,
+from django_filters.rest_framework import (BooleanFilter, ChoiceFilter,
+                                           FilterSet,
                                            ModelMultipleChoiceFilter)
 
 from users.models import User
 from recipes.models import Recipe, Tag
+from recipes.trending import order_by_trending
 
 
 class RecipeFilter(FilterSet):
@@ -14,6 +16,8 @@ class RecipeFilter(FilterSet):
                                        queryset=User.objects.all())
     is_favorited = BooleanFilter(method='filter_favorited')
     is_in_shopping_cart = BooleanFilter(method='filter_in_shopping_cart')
+    ordering = ChoiceFilter(choices=(('trending', 'trending'),),
+                            method='filter_ordering')
 
     def filter_favorited(self, queryset, name, value):
         user = self.request.user
@@ -28,6 +32,10 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shopping_recipes__user=user)
         return queryset
 
+    def filter_ordering(self, queryset, name, value):
+        # рейтинг считает команда update_trending
+        return order_by_trending(queryset)
+
     class Meta:
         model = Recipe
         fields = ('author', 'tags', 'is_favorited')
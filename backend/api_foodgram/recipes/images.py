@@ -0,0 +1,91 @@
+"""
+Уменьшенные копии изображений рецептов.
+
+После сохранения рецепта с новой картинкой в пуле потоков процесса
+генерируются копии нескольких ширин в WebP и JPEG без метаданных. Когда
+копии готовы, их ширины записываются в Recipe.image_widths, и сериализаторы
+начинают отдавать их в поле image_srcset.
+"""
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from recipes.background import run_in_background
+from recipes.models import Recipe
+
+IMAGE_WIDTHS = (320, 640, 1280)
+IMAGE_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True,
+             'progressive': True},
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+    thread_name_prefix='recipe-images'
+)
+
+
+# копии пишутся под своими именами, без хеширования содержимого
+derivative_storage = FileSystemStorage()
+
+
+def derivative_dir(name):
+    return f'recipes/derivatives/{os.path.basename(name)}'
+
+
+def derivative_name(name, width, extension):
+    return f'{derivative_dir(name)}/{width}.{extension}'
+
+
+def generate_derivatives(recipe_id, name):
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    # картинка не увеличивается: берутся ширины не больше исходной
+    widths = [width for width in IMAGE_WIDTHS if width <= image.width]
+    widths = widths or [image.width]
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS)
+        for extension, options in IMAGE_FORMATS.items():
+            # новый объект без info, чтобы не переносить exif и icc
+            buffer = io.BytesIO()
+            resized.save(buffer, **options)
+            path = derivative_name(name, width, extension)
+            if derivative_storage.exists(path):
+                derivative_storage.delete(path)
+            derivative_storage.save(path, ContentFile(buffer.getvalue()))
+    # копии привязываются к рецепту, только если картинку не успели сменить
+    Recipe.objects.filter(pk=recipe_id, image=name).update(
+        image_widths=','.join(str(width) for width in widths),
+        revision=F('revision') + 1
+    )
+
+
+def schedule_derivatives(recipe):
+    """Ставит генерацию копий в очередь после коммита транзакции."""
+    name = recipe.image.name
+    if not name:
+        return
+    run_in_background(executor, generate_derivatives, recipe.pk, name)
+
+
+def get_image_srcset(recipe, request=None):
+    srcset = {}
+    for width in filter(None, recipe.image_widths.split(',')):
+        srcset[width] = {}
+        for extension in IMAGE_FORMATS:
+            url = derivative_storage.url(
+                derivative_name(recipe.image.name, width, extension)
+            )
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            srcset[width][extension] = url
+    return srcset
@@ -0,0 +1,59 @@
+"""
+Версии индексов, которые процессы держат в памяти.
+
+Версия хранится в базе (IndexVersion) и меняется в той же транзакции, что
+и данные индекса, поэтому изменения из любого процесса - веб-воркера или
+management-команды - видят все процессы. Процесс перечитывает версию не
+чаще раза в INDEX_VERSION_CHECK_SECONDS.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from recipes.models import IndexVersion
+
+
+class VersionReader:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked = {}
+
+    def get(self, name):
+        """Пустая строка, если индекс еще не менялся."""
+        now = time.monotonic()
+        with self.lock:
+            checked = self.checked.get(name)
+        if (checked is not None
+                and now - checked[0] < settings.INDEX_VERSION_CHECK_SECONDS):
+            return checked[1]
+        version = IndexVersion.objects.filter(name=name).values_list(
+            'version', flat=True
+        ).first() or ''
+        with self.lock:
+            self.checked[name] = (now, version)
+        return version
+
+    def forget(self, name):
+        with self.lock:
+            self.checked.pop(name, None)
+
+
+versions = VersionReader()
+
+# теги и ингредиенты: входят в ETag ответов с рецептами, см. api/etags.py
+REFERENCES = 'references'
+
+
+def get_index_version(name):
+    return versions.get(name)
+
+
+def bump_index_version(name):
+    IndexVersion.objects.update_or_create(
+        name=name, defaults={'version': uuid.uuid4().hex}
+    )
+    # этот процесс перечитает версию при следующем обращении
+    versions.forget(name)
@@ -0,0 +1,87 @@
+"""
+Индекс ингредиентов для автодополнения.
+
+Индекс строится один раз на процесс и хранится в памяти: отсортированный
+список нормализованных названий, по которому префикс ищется бинарным
+поиском. Изменения модели Ingredient меняют версию индекса в базе (через
+сигналы, а load_ingredients - явно), по ней индекс перестраивается во всех
+процессах, см. recipes/index_version.py.
+"""
+import bisect
+import threading
+
+from recipes.index_version import bump_index_version, get_index_version
+from recipes.models import Ingredient
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+INDEX_NAME = 'ingredients'
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е').strip()
+
+
+def invalidate_ingredient_index():
+    bump_index_version(INDEX_NAME)
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = []
+        self._items = []
+
+    def _build(self, version):
+        rows = sorted(
+            (normalize(name), pk, measurement_unit, name)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator()
+        )
+        self._keys = [key for key, _, _, _ in rows]
+        self._items = [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, measurement_unit, name in rows
+        ]
+        self._version = version
+
+    def _ensure_fresh(self):
+        version = get_index_version(INDEX_NAME)
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version != version:
+                self._build(version)
+
+    def all(self):
+        self._ensure_fresh()
+        return list(self._items)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+        self._ensure_fresh()
+        query = normalize(query)
+        keys, items = self._keys, self._items
+        result = []
+        start = bisect.bisect_left(keys, query)
+        end = start
+        while (end < len(keys) and len(result) < limit
+               and keys[end].startswith(query)):
+            result.append(items[end])
+            end += 1
+        if len(result) == limit:
+            return result
+        # совпадения по префиксу лежат подряд в [start, end)
+        for position, key in enumerate(keys):
+            if start <= position < end or query not in key:
+                continue
+            result.append(items[position])
+            if len(result) == limit:
+                break
+        return result
+
+
+ingredient_index = IngredientIndex()
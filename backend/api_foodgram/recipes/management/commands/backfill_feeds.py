@@ -0,0 +1,22 @@
+"""
+Using: python manage.py backfill_feeds
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.feed import backfill_feed
+from users.models import Follow
+
+
+class Command(BaseCommand):
+    help = ('Добавляет в ленты подписчиков последние рецепты авторов '
+            'по существующим подпискам')
+
+    def handle(self, *args, **options):
+        count = 0
+        follows = Follow.objects.order_by('id').values_list(
+            'user_id', 'author_id'
+        )
+        for user_id, author_id in follows.iterator():
+            backfill_feed(user_id, author_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано подписок: {count}'))
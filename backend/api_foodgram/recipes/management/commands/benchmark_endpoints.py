@@ -0,0 +1,200 @@
+"""
+Using: python manage.py benchmark_endpoints [--output result.json]
+       [--baseline previous.json] [--max-slowdown 2] [--iterations 20]
+Замеряет время ответа и число запросов к базе для основных эндпоинтов
+на данных из базы (например, созданных seed_synthetic). С --baseline
+команда завершается с ошибкой, если какой-то эндпоинт стал медленнее
+или делает больше запросов, чем в сохраненном результате.
+"""
+import json
+import math
+import time
+from itertools import combinations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import (CaptureQueriesContext,
+                               setup_test_environment,
+                               teardown_test_environment)
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag, UserShoppingRecipe
+from users.models import User
+
+PERCENTILES = (50, 90, 99)
+# замедление меньше стольких миллисекунд считается шумом
+MIN_SLOWDOWN_MS = 2
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+
+def read_response(response):
+    # потоковый ответ формируется при чтении, оно входит в замер
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа и число запросов к базе для '
+            'эндпоинтов рецептов, подписок, ингредиентов и списка покупок')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', help='Файл для результата в JSON')
+        parser.add_argument(
+            '--baseline',
+            help='Результат прошлого запуска для сравнения'
+        )
+        parser.add_argument(
+            '--max-slowdown', type=float, default=2.0,
+            help='Во сколько раз может вырасти медиана времени ответа'
+        )
+        parser.add_argument(
+            '--user', type=int,
+            help='id пользователя, от имени которого идут запросы; по '
+                 'умолчанию - пользователь с самой большой корзиной'
+        )
+
+    def handle(self, *args, **options):
+        # разрешает хост testserver тестового клиента
+        setup_test_environment()
+        try:
+            self.run(options)
+        finally:
+            teardown_test_environment()
+
+    def run(self, options):
+        user = self.get_user(options['user'])
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        anonymous = APIClient()
+
+        scenarios = {}
+        for name, request_client, url in self.get_scenarios(
+                user, client, anonymous):
+            scenarios[name] = self.measure(request_client, url, options)
+            self.stderr.write(
+                f'{name}: p50 {scenarios[name]["p50_ms"]} ms, '
+                f'запросов {scenarios[name]["queries"]}'
+            )
+        result = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'user_id': user.pk,
+                'iterations': options['iterations'],
+            },
+            'scenarios': scenarios,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+        else:
+            self.stdout.write(json.dumps(result, ensure_ascii=False,
+                                         indent=2))
+        if options['baseline']:
+            self.compare(result, options['baseline'],
+                         options['max_slowdown'])
+
+    def get_user(self, user_id):
+        if user_id is not None:
+            return User.objects.get(pk=user_id)
+        busiest = UserShoppingRecipe.objects.values('user_id').annotate(
+            total=Count('id')
+        ).order_by('-total', 'user_id').values_list('user_id', flat=True)
+        user = User.objects.filter(pk__in=busiest[:1]).first()
+        if user is None:
+            raise CommandError('Нет пользователей с корзиной: сначала '
+                               'запустите seed_synthetic')
+        return user
+
+    def get_scenarios(self, user, client, anonymous):
+        author_id = Recipe.objects.values('author_id').annotate(
+            total=Count('id')
+        ).order_by('-total').values_list('author_id', flat=True).first()
+        tag = Tag.objects.values_list('slug', flat=True).first()
+        recipe_id = Recipe.objects.order_by(
+            '-favorites_count', 'id'
+        ).values_list('id', flat=True).first()
+        ingredient = Ingredient.objects.values_list('name', flat=True).first()
+
+        yield 'recipes list anonymous', anonymous, '/api/recipes/'
+        # все сочетания фильтров RecipeFilter
+        filters = {
+            'tags': f'tags={tag}',
+            'author': f'author={author_id}',
+            'is_favorited': 'is_favorited=1',
+            'is_in_shopping_cart': 'is_in_shopping_cart=1',
+            'ordering': 'ordering=trending',
+        }
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                query = '&'.join(filters[name] for name in names)
+                yield (f'recipes list [{",".join(names)}]', client,
+                       f'/api/recipes/?{query}')
+        yield 'recipe detail', client, f'/api/recipes/{recipe_id}/'
+        yield ('subscriptions', client,
+               '/api/users/subscriptions/?recipes_limit=3')
+        yield ('ingredient search', anonymous,
+               f'/api/ingredients/?name={ingredient[:3]}')
+        for file_format in ('pdf', 'txt', 'csv', 'json'):
+            yield (f'shopping cart {file_format}', client,
+                   '/api/recipes/download_shopping_cart/'
+                   f'?format={file_format}')
+
+    def measure(self, client, url, options):
+        for _ in range(options['warmup']):
+            read_response(client.get(url))
+        durations = []
+        for _ in range(options['iterations']):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.get(url)
+                read_response(response)
+                durations.append((time.perf_counter() - start) * 1000)
+        result = {
+            f'p{percent}_ms': round(percentile(durations, percent), 2)
+            for percent in PERCENTILES
+        }
+        result['mean_ms'] = round(sum(durations) / len(durations), 2)
+        result['queries'] = len(queries)
+        result['status'] = response.status_code
+        return result
+
+    def compare(self, result, path, max_slowdown):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)['scenarios']
+        regressions = []
+        for name, current in result['scenarios'].items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if (current['p50_ms'] > previous['p50_ms'] * max_slowdown
+                    and current['p50_ms'] - previous['p50_ms']
+                    > MIN_SLOWDOWN_MS):
+                regressions.append(
+                    f'{name}: p50 {previous["p50_ms"]} -> '
+                    f'{current["p50_ms"]} ms'
+                )
+            if current['queries'] > previous['queries']:
+                regressions.append(
+                    f'{name}: запросов {previous["queries"]} -> '
+                    f'{current["queries"]}'
+                )
+        if regressions:
+            raise CommandError('Замедление относительно ' + path + ':\n'
+                               + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS(
+            f'Замедлений относительно {path} нет'
+        ))
@@ -0,0 +1,116 @@
+"""
+Using: python manage.py benchmark_trending [--favorites 1000000]
+Все созданные данные откатываются в конце.
+"""
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from recipes.models import Recipe, Tag, TagRecipe, UserFavoriteRecipe
+from recipes.trending import order_by_trending, update_trending_scores
+from users.models import User
+
+BATCH_SIZE = 10000
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, round(time.perf_counter() - start, 3)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пересчет рейтинга trending и выборку страницы '
+            'на синтетических данных')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--favorites', type=int, default=1000000)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        with transaction.atomic():
+            result = self.run(options)
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def create_data(self, users_count, recipes_count):
+        first_user = next_id(User)
+        User.objects.bulk_create(
+            (User(id=first_user + i, email=f'bench{first_user + i}@bench',
+                  username=f'bench{first_user + i}', password='!')
+             for i in range(users_count))
+        )
+        tag = Tag.objects.create(name='benchmark', slug='benchmark')
+        first_recipe = next_id(Recipe)
+        Recipe.objects.bulk_create(
+            (Recipe(id=first_recipe + i, name=f'recipe {i}', text='text',
+                    cooking_time=10, image='recipes/bench.png',
+                    author_id=first_user + i % users_count)
+             for i in range(recipes_count))
+        )
+        TagRecipe.objects.bulk_create(
+            (TagRecipe(tag=tag, recipe_id=first_recipe + i)
+             for i in range(0, recipes_count, 2))
+        )
+        return first_user, first_recipe, tag
+
+    def create_favorites(self, count, users, recipes, seen):
+        # популярность рецептов неравномерная: небольшая часть рецептов
+        # собирает большую часть избранного
+        first_user, users_count = users
+        first_recipe, recipes_count = recipes
+        batch = []
+        while count:
+            pair = (first_user + random.randrange(users_count),
+                    first_recipe + int(recipes_count * random.random() ** 3))
+            if pair in seen:
+                continue
+            seen.add(pair)
+            batch.append(UserFavoriteRecipe(user_id=pair[0],
+                                            recipe_id=pair[1]))
+            count -= 1
+            if len(batch) == BATCH_SIZE or not count:
+                UserFavoriteRecipe.objects.bulk_create(batch)
+                batch = []
+
+    def page(self, tag=None):
+        queryset = Recipe.objects.all()
+        if tag is not None:
+            queryset = queryset.filter(tags=tag)
+        return list(order_by_trending(queryset).values_list('id')[:6])
+
+    def run(self, options):
+        users = (options['users'], options['recipes'])
+        first_user, first_recipe, tag = self.create_data(*users)
+        users = (first_user, options['users'])
+        recipes = (first_recipe, options['recipes'])
+        seen = set()
+        _, seed_time = timed(self.create_favorites, options['favorites'],
+                             users, recipes, seen)
+        updated, full_time = timed(update_trending_scores)
+        self.create_favorites(10000, users, recipes, seen)
+        incremental, incremental_time = timed(update_trending_scores)
+        _, page_time = timed(self.page)
+        _, tag_page_time = timed(self.page, tag)
+        return {
+            'favorites': options['favorites'],
+            'recipes': options['recipes'],
+            'seed_seconds': seed_time,
+            'first_run_seconds': full_time,
+            'first_run_recipes': updated,
+            'incremental_10k_seconds': incremental_time,
+            'incremental_recipes': incremental,
+            'page_seconds': page_time,
+            'page_with_tag_seconds': tag_page_time,
+        }
@@ -0,0 +1,60 @@
+"""
+Using: python manage.py check_shopping_lists [--fix] [--batch-size 1000]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.shopping_list import (get_live_shopping_lists,
+                                   get_stored_shopping_lists,
+                                   lock_shopping_lists, rebuild_shopping_lists)
+from users.models import User
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Сверяет сохраненные списки покупок с суммой ингредиентов '
+            'рецептов в корзинах')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Пересобрать разошедшиеся списки покупок'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        mismatched = 0
+        last_id = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(id__gt=last_id).order_by(
+                    'id'
+                ).values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not user_ids:
+                break
+            mismatched += self.check_batch(user_ids, options['fix'])
+            last_id = user_ids[-1]
+        message = f'Разошедшихся списков покупок: {mismatched}'
+        if mismatched and not options['fix']:
+            self.stdout.write(self.style.ERROR(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    @transaction.atomic
+    def check_batch(self, user_ids, fix):
+        # пока идет сверка, корзины пакета не меняются
+        lock_shopping_lists(user_ids)
+        live = get_live_shopping_lists(user_ids)
+        stored = get_stored_shopping_lists(user_ids)
+        broken = sorted({
+            user_id for user_id, ingredient_id in live.keys() | stored.keys()
+            if live.get((user_id, ingredient_id))
+            != stored.get((user_id, ingredient_id))
+        })
+        for user_id in broken:
+            self.stdout.write(f'Пользователь {user_id}: список расходится')
+        if fix and broken:
+            rebuild_shopping_lists(broken)
+        return len(broken)
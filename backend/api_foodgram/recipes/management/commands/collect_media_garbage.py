@@ -0,0 +1,93 @@
+"""
+Using: python manage.py collect_media_garbage [--dry-run]
+"""
+import os
+import shutil
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.images import derivative_dir
+from recipes.models import Recipe
+
+BATCH_SIZE = 1000
+RECIPES_DIR = 'recipes'
+DERIVATIVES_DIR = os.path.join(RECIPES_DIR, 'derivatives')
+
+
+def iter_entries(path):
+    """Обходит каталог потоком, не собирая список файлов в памяти."""
+    try:
+        scan = os.scandir(path)
+    except FileNotFoundError:
+        return
+    with scan:
+        yield from scan
+
+
+def iter_batches(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы картинок, на которые не ссылается ни один рецепт'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+
+    def referenced(self, names):
+        return set(
+            Recipe.objects.filter(image__in=names).values_list(
+                'image', flat=True
+            )
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        removed = 0
+
+        originals = (
+            entry for entry in iter_entries(
+                os.path.join(settings.MEDIA_ROOT, RECIPES_DIR)
+            ) if entry.is_file()
+        )
+        for batch in iter_batches(originals):
+            names = {
+                f'{RECIPES_DIR}/{entry.name}': entry for entry in batch
+            }
+            used = self.referenced(list(names))
+            for name in names.keys() - used:
+                if default_storage.is_recently_used(name):
+                    continue
+                if not dry_run:
+                    default_storage.delete(name)
+                removed += 1
+                self.stdout.write(name)
+
+        derivatives = (
+            entry for entry in iter_entries(
+                os.path.join(settings.MEDIA_ROOT, DERIVATIVES_DIR)
+            ) if entry.is_dir()
+        )
+        for batch in iter_batches(derivatives):
+            names = {f'{RECIPES_DIR}/{entry.name}': entry for entry in batch}
+            used = self.referenced(list(names))
+            for name in names.keys() - used:
+                # копии могли создаться для только что загруженной
+                # картинки, еще не сохраненной в рецепте
+                if default_storage.is_recently_used(derivative_dir(name)):
+                    continue
+                if not dry_run:
+                    shutil.rmtree(names[name].path, ignore_errors=True)
+                removed += 1
+                self.stdout.write(derivative_dir(name))
+
+        self.stdout.write(self.style.SUCCESS(f'Удалено: {removed}'))
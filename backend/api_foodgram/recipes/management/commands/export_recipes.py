@@ -0,0 +1,89 @@
+"""
+Using: python manage.py export_recipes [recipes.jsonl] [--chunk-size 1000]
+"""
+import json
+import sys
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from recipes.models import IngredientRecipe, Recipe
+
+CHUNK_SIZE = 1000
+
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def serialize_recipe(recipe):
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'author': recipe.author.email,
+        'image': recipe.image.name,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.ingredientrecipe_set.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Выгружает рецепты в формате JSON Lines: один рецепт в строке'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def iter_recipes(self, chunk_size):
+        # iterator() не поддерживает prefetch_related, поэтому id читаются
+        # потоком, а связи подгружаются отдельно для каждой порции
+        ids = Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        ).iterator(chunk_size=chunk_size)
+        recipes = Recipe.objects.order_by('id').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredientrecipe_set',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            )
+        )
+        for chunk in iter_chunks(ids, chunk_size):
+            yield from recipes.filter(id__in=chunk)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file = (
+            sys.stdout if path == '-'
+            else open(path, 'w', encoding='utf-8')
+        )
+        count = 0
+        try:
+            for recipe in self.iter_recipes(options['chunk_size']):
+                file.write(json.dumps(
+                    serialize_recipe(recipe), ensure_ascii=False
+                ))
+                file.write('\n')
+                count += 1
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        self.stderr.write(self.style.SUCCESS(f'Выгружено рецептов: {count}'))
@@ -0,0 +1,27 @@
+"""
+Using: python manage.py generate_image_derivatives [--all]
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_derivatives
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии картинок рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать копии и для рецептов, у которых они уже есть'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_widths='')
+        count = 0
+        for recipe_id, name in recipes.values_list('id', 'image').iterator():
+            generate_derivatives(recipe_id, name)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано рецептов: {count}'))
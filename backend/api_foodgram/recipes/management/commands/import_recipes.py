@@ -0,0 +1,167 @@
+"""
+Using: python manage.py import_recipes recipes.jsonl
+           [--chunk-size 1000] [--checkpoint recipes.jsonl.progress]
+"""
+import json
+import os
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from recipes.models import (Ingredient, IngredientRecipe, Recipe, Tag,
+                            TagRecipe)
+from recipes.pantry_index import invalidate_pantry_index
+from users.models import User
+from users.utils import change_counter
+
+CHUNK_SIZE = 1000
+
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, encoding='utf-8') as file:
+        return int(file.read().strip() or 0)
+
+
+def write_checkpoint(path, line_number):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(str(line_number))
+    os.replace(tmp_path, path)
+
+
+class Command(BaseCommand):
+    help = ('Загружает рецепты из файла JSON Lines, выгруженного '
+            'командой export_recipes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с номером последней загруженной строки: при '
+                 'повторном запуске загрузка продолжится с нее'
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        chunk_size = options['chunk_size']
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        }
+        self.imported = self.skipped = 0
+
+        line_number = read_checkpoint(checkpoint)
+        with open(options['path'], encoding='utf-8') as file:
+            lines = enumerate(islice(file, line_number, None),
+                              start=line_number + 1)
+            while True:
+                chunk = list(islice(lines, chunk_size))
+                if not chunk:
+                    break
+                self.import_chunk(chunk)
+                line_number = chunk[-1][0]
+                if checkpoint:
+                    write_checkpoint(checkpoint, line_number)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {self.imported}, '
+            f'пропущено: {self.skipped}'
+        ))
+
+    def decode(self, chunk):
+        for line_number, line in chunk:
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as error:
+                self.skip(line_number, error)
+
+    def skip(self, line_number, error):
+        self.skipped += 1
+        self.stderr.write(f'Строка {line_number} пропущена: {error!r}')
+
+    def build(self, data, authors):
+        recipe = Recipe(
+            name=data['name'],
+            text=data['text'],
+            cooking_time=data['cooking_time'],
+            author_id=authors[data['author']],
+            image=data.get('image') or '',
+        )
+        tag_ids = {self.tags[slug] for slug in data['tags']}
+        amounts = {
+            self.ingredients[(item['name'], item['measurement_unit'])]:
+                item['amount']
+            for item in data['ingredients']
+        }
+        pub_date = parse_datetime(data.get('pub_date') or '')
+        return recipe, pub_date, tag_ids, amounts
+
+    def import_chunk(self, chunk):
+        records = list(self.decode(chunk))
+        # авторов в файле может быть сколько угодно много, поэтому они
+        # ищутся одним запросом на порцию, а не загружаются заранее
+        emails = {
+            data.get('author') for _, data in records
+            if isinstance(data, dict) and isinstance(data.get('author'), str)
+        }
+        authors = dict(
+            User.objects.filter(email__in=emails).values_list('email', 'id')
+        )
+        parsed = []
+        for line_number, data in records:
+            try:
+                parsed.append(self.build(data, authors))
+            except (KeyError, TypeError, ValueError) as error:
+                self.skip(line_number, error)
+        if parsed:
+            self.save(parsed)
+            self.imported += len(parsed)
+
+    @transaction.atomic
+    def save(self, parsed):
+        recipes = [recipe for recipe, *_ in parsed]
+        if not connection.features.can_return_ids_from_bulk_insert:
+            # без RETURNING bulk_create не проставит id, поэтому они
+            # назначаются заранее внутри транзакции
+            last_id = Recipe.objects.aggregate(last=Max('id'))['last'] or 0
+            for pk, recipe in enumerate(recipes, start=last_id + 1):
+                recipe.pk = pk
+        Recipe.objects.bulk_create(recipes)
+        # bulk_create не отправляет сигналы, счетчики меняются здесь же
+        authors = Counter(recipe.author_id for recipe in recipes)
+        for author_id, count in authors.items():
+            change_counter(User, author_id, 'recipes_count', count)
+
+        # auto_now_add перезаписывает дату при вставке, поэтому дата из
+        # файла восстанавливается отдельным запросом
+        dated = []
+        for recipe, pub_date, *_ in parsed:
+            if pub_date is not None:
+                recipe.pub_date = pub_date
+                dated.append(recipe)
+        if dated:
+            Recipe.objects.bulk_update(dated, ['pub_date'])
+
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe_id=recipe.pk, ingredient_id=ingredient_id, amount=amount
+            )
+            for recipe, _, _, amounts in parsed
+            for ingredient_id, amount in amounts.items()
+        )
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe_id=recipe.pk, tag_id=tag_id)
+            for recipe, _, tag_ids, _ in parsed
+            for tag_id in tag_ids
+        )
+        transaction.on_commit(invalidate_pantry_index)
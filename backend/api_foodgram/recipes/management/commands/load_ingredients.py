@@ -0,0 +1,101 @@
+"""
+Using: python manage.py load_ingredients [data/ingredients.json]
+"""
+import csv
+import io
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.ingredient_index import invalidate_ingredient_index
+from recipes.models import Ingredient
+
+DEFAULT_PATH = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+def iter_json(file):
+    """Читает json-массив объектов по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается json-массив ингредиентов')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный json-файл')
+            buffer += chunk
+            continue
+        yield item['name'], item['measurement_unit']
+        buffer = buffer[end:]
+
+
+def copy_ingredients(rows):
+    # на PostgreSQL COPY быстрее пакетных INSERT
+    data = io.StringIO()
+    csv.writer(data).writerows(rows)
+    data.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            'COPY recipes_ingredient (name, measurement_unit) '
+            'FROM STDIN WITH (FORMAT csv)',
+            data
+        )
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из csv или json, пропуская существующие'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        reader = iter_json if path.endswith('.json') else iter_csv
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+        new_rows = []
+        skipped = 0
+        with open(path, encoding='utf-8') as file:
+            for name, measurement_unit in reader(file):
+                row = (name.strip(), measurement_unit.strip())
+                if row in existing:
+                    skipped += 1
+                    continue
+                existing.add(row)
+                new_rows.append(row)
+
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                copy_ingredients(new_rows)
+            else:
+                Ingredient.objects.bulk_create(
+                    (Ingredient(name=name, measurement_unit=unit)
+                     for name, unit in new_rows),
+                    batch_size=options['batch_size']
+                )
+            # bulk_create и COPY не отправляют сигналы модели; версия
+            # индекса меняется вместе с данными, в той же транзакции
+            invalidate_ingredient_index()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {len(new_rows)}, пропущено: {skipped}'
+        ))
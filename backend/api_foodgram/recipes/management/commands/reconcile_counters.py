@@ -0,0 +1,81 @@
+"""
+Using: python manage.py reconcile_counters [--batch-size 1000]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from recipes.models import Recipe, UserFavoriteRecipe
+from users.models import Follow, User
+
+BATCH_SIZE = 1000
+
+# модель со счетчиками: {счетчик: (модель связи, поле ссылки на объект)}
+COUNTERS = (
+    (Recipe, {'favorites_count': (UserFavoriteRecipe, 'recipe_id')}),
+    (User, {'recipes_count': (Recipe, 'author_id'),
+            'followers_count': (Follow, 'author_id')}),
+)
+
+
+def count_related(model, field, ids):
+    return dict(
+        model.objects.filter(**{f'{field}__in': ids}).order_by().values(
+            field
+        ).annotate(total=Count('id')).values_list(field, 'total')
+    )
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает хранимые счетчики избранного, рецептов '
+            'и подписчиков и исправляет разошедшиеся')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for model, counters in COUNTERS:
+            fixed = self.reconcile(model, counters, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: исправлено {fixed}'
+            ))
+
+    def reconcile(self, model, counters, batch_size):
+        fixed = 0
+        last_id = 0
+        while True:
+            ids = list(
+                model.objects.filter(id__gt=last_id).order_by(
+                    'id'
+                ).values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return fixed
+            fixed += self.reconcile_batch(model, counters, ids)
+            last_id = ids[-1]
+
+    @transaction.atomic
+    def reconcile_batch(self, model, counters, ids):
+        # строки блокируются до подсчета: параллельное изменение счетчика
+        # дождется конца пакета и применится к исправленному значению
+        objects = list(model.objects.select_for_update().filter(
+            id__in=ids
+        ).order_by('id').only('id', *counters))
+        actual = {
+            field: count_related(related_model, related_field, ids)
+            for field, (related_model, related_field) in counters.items()
+        }
+        changed = []
+        for obj in objects:
+            values = {
+                field: totals.get(obj.id, 0)
+                for field, totals in actual.items()
+            }
+            if any(getattr(obj, field) != value
+                   for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(obj, field, value)
+                changed.append(obj)
+        if changed:
+            model.objects.bulk_update(changed, list(counters))
+        return len(changed)
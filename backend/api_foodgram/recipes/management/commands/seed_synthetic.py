@@ -0,0 +1,223 @@
+"""
+Using: python manage.py seed_synthetic [--users 1000] [--recipes 5000]
+Создает синтетических пользователей, рецепты, подписки, избранное и
+корзины для замеров (см. benchmark_endpoints). Пользователи создаются с
+именами synthetic<id> и без пароля.
+"""
+import random
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.ingredient_index import invalidate_ingredient_index
+from recipes.models import (FeedEntry, Ingredient, IngredientRecipe, Recipe,
+                            Tag, TagRecipe, UserFavoriteRecipe,
+                            UserShoppingRecipe)
+from recipes.pantry_index import invalidate_pantry_index
+from recipes.shopping_list import rebuild_shopping_lists
+from users.models import Follow, User
+
+BATCH_SIZE = 10000
+TAGS = (
+    ('Завтрак', 'breakfast', '#ebe234'),
+    ('Обед', 'lunch', '#34eb37'),
+    ('Ужин', 'dinner', '#4634eb'),
+)
+SYNTHETIC_IMAGE = 'recipes/synthetic.png'
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def skewed(values, power):
+    # чем больше power, тем сильнее выбор смещен к началу списка:
+    # небольшая часть авторов и рецептов собирает большую часть
+    # подписок и добавлений
+    return values[int(len(values) * random.random() ** power)]
+
+
+def sample_skewed(values, count, power, exclude=None):
+    # не больше половины значений, иначе выбор хвоста затягивается
+    count = min(count, len(values) // 2)
+    chosen = set()
+    while len(chosen) < count:
+        value = skewed(values, power)
+        if value != exclude:
+            chosen.add(value)
+    return chosen
+
+
+def bulk_create(model, objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+
+
+class Command(BaseCommand):
+    help = ('Создает синтетических пользователей, рецепты, подписки, '
+            'избранное и корзины с неравномерной популярностью')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument(
+            '--ingredients', type=int, default=2000,
+            help='Сколько ингредиентов должно быть в базе; недостающие '
+                 'создаются'
+        )
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя в среднем')
+        parser.add_argument('--favorites', type=int, default=30,
+                            help='Рецептов в избранном в среднем')
+        parser.add_argument('--cart', type=int, default=5,
+                            help='Рецептов в корзине в среднем')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        with transaction.atomic():
+            tag_ids = self.create_tags()
+            ingredient_ids = self.create_ingredients(options['ingredients'])
+            user_ids = self.create_users(options['users'])
+            recipes = self.create_recipes(
+                options['recipes'], user_ids, tag_ids, ingredient_ids
+            )
+            recipe_ids = [recipe_id for recipe_id, _, _ in recipes]
+            follows = self.create_records(
+                Follow, 'author_id', user_ids, user_ids,
+                options['follows'], power=3, exclude_self=True
+            )
+            self.create_feeds(follows, recipes)
+            self.create_records(UserFavoriteRecipe, 'recipe_id', user_ids,
+                                recipe_ids, options['favorites'], power=3)
+            self.create_records(UserShoppingRecipe, 'recipe_id', user_ids,
+                                recipe_ids, options['cart'], power=2)
+            transaction.on_commit(invalidate_ingredient_index)
+            transaction.on_commit(invalidate_pantry_index)
+
+        # bulk_create не отправляет сигналы: производные данные
+        # пересчитываются теми же командами, что и после миграций
+        for start in range(0, len(user_ids), BATCH_SIZE):
+            with transaction.atomic():
+                rebuild_shopping_lists(user_ids[start:start + BATCH_SIZE])
+        call_command('reconcile_counters', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}'
+        ))
+
+    def create_tags(self):
+        return [
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )[0].pk
+            for name, slug, color in TAGS
+        ]
+
+    def create_ingredients(self, count):
+        missing = count - Ingredient.objects.count()
+        if missing > 0:
+            first = next_id(Ingredient)
+            bulk_create(Ingredient, (
+                Ingredient(id=first + i, name=f'ингредиент {first + i}',
+                           measurement_unit=random.choice(('г', 'мл', 'шт')))
+                for i in range(missing)
+            ))
+        return list(Ingredient.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+
+    def create_users(self, count):
+        first = next_id(User)
+        bulk_create(User, (
+            User(id=first + i, email=f'synthetic{first + i}@example.com',
+                 username=f'synthetic{first + i}', first_name='Synthetic',
+                 last_name=str(first + i), password='!')
+            for i in range(count)
+        ))
+        return list(range(first, first + count))
+
+    def create_recipes(self, count, user_ids, tag_ids, ingredient_ids):
+        """Возвращает список (id, id автора, дата публикации)."""
+        first = next_id(Recipe)
+        recipe_ids = list(range(first, first + count))
+        recipes = [
+            Recipe(id=recipe_id, name=f'Рецепт {recipe_id}',
+                   text='Синтетический рецепт', image=SYNTHETIC_IMAGE,
+                   cooking_time=random.randint(5, 120),
+                   author_id=skewed(user_ids, 2))
+            for recipe_id in recipe_ids
+        ]
+        bulk_create(Recipe, recipes)
+        # auto_now_add ставит всем одну дату, поэтому даты публикации
+        # за последний год проставляются отдельно
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                minutes=random.randrange(525600)
+            )
+        Recipe.objects.bulk_update(recipes, ['pub_date'],
+                                   batch_size=BATCH_SIZE // 10)
+        # соль и вода встречаются почти везде, экзотика - редко
+        bulk_create(IngredientRecipe, (
+            IngredientRecipe(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                             amount=random.randint(1, 500))
+            for recipe_id in recipe_ids
+            for ingredient_id in sample_skewed(
+                ingredient_ids, random.randint(3, 12), power=2
+            )
+        ))
+        bulk_create(TagRecipe, (
+            TagRecipe(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in random.sample(tag_ids, random.randint(1, 2))
+        ))
+        return [(recipe.pk, recipe.author_id, recipe.pub_date)
+                for recipe in recipes]
+
+    def create_records(self, model, field, user_ids, target_ids, mean,
+                       power, exclude_self=False):
+        # активность пользователей тоже неравномерная: число записей
+        # распределено экспоненциально со средним mean
+        pairs = [
+            (user_id, target_id)
+            for user_id in user_ids
+            for target_id in sample_skewed(
+                target_ids, int(random.expovariate(1 / mean)) if mean else 0,
+                power, exclude=user_id if exclude_self else None
+            )
+        ]
+        bulk_create(model, (
+            model(user_id=user_id, **{field: target_id})
+            for user_id, target_id in pairs
+        ))
+        return pairs
+
+    def create_feeds(self, follows, recipes):
+        # то же, что backfill_feeds, но по уже известным данным, без
+        # запросов на каждую подписку
+        followers = Counter(author_id for _, author_id in follows)
+        latest = defaultdict(list)
+        for recipe_id, author_id, pub_date in recipes:
+            latest[author_id].append((pub_date, recipe_id))
+        for author_recipes in latest.values():
+            author_recipes.sort(reverse=True)
+            del author_recipes[settings.FEED_BACKFILL_SIZE:]
+        bulk_create(FeedEntry, (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                      author_id=author_id, pub_date=pub_date)
+            for user_id, author_id in follows
+            if followers[author_id] <= settings.FEED_FANOUT_MAX_FOLLOWERS
+            for pub_date, recipe_id in latest[author_id]
+        ))
@@ -0,0 +1,23 @@
+"""
+Using: python manage.py update_similar_recipes [--full]
+Запускается периодически, например cron раз в час.
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import update_similar_recipes
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие рецепты для измененных рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать похожие рецепты для всех рецептов'
+        )
+
+    def handle(self, *args, **options):
+        updated = update_similar_recipes(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {updated}'
+        ))
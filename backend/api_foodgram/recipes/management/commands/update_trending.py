@@ -0,0 +1,18 @@
+"""
+Using: python manage.py update_trending
+Запускается периодически, например cron раз в 10 минут.
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.trending import update_trending_scores
+
+
+class Command(BaseCommand):
+    help = ('Добавляет к рейтингу trending новые записи избранного '
+            'и корзин')
+
+    def handle(self, *args, **options):
+        updated = update_trending_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлен рейтинг рецептов: {updated}'
+        ))
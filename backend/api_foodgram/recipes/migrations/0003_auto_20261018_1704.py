@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_auto_20230420_0558'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ingredientrecipe',
+            options={'verbose_name': 'Связь ингредиента с рецептом', 'verbose_name_plural': 'Связь ингредиентов с рецептами'},
+        ),
+        migrations.AlterModelOptions(
+            name='tagrecipe',
+            options={'verbose_name': 'Связь тэга с рецептом', 'verbose_name_plural': 'Связь тэгов с рецептами'},
+        ),
+        migrations.AlterModelOptions(
+            name='userfavoriterecipe',
+            options={'verbose_name': 'Рецепт из избранного пользователя', 'verbose_name_plural': 'Рецепты из избранного пользователей'},
+        ),
+        migrations.AlterModelOptions(
+            name='usershoppingrecipe',
+            options={'verbose_name': 'Рецепт из списка покупок пользователя', 'verbose_name_plural': 'Рецепты из списков покупок пользователей'},
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия рецепта'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientrecipe',
+            name='amount',
+            field=models.PositiveIntegerField(),
+        ),
+    ]
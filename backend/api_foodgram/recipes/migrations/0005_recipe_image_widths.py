@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_auto_20261018_1706'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_widths',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200, verbose_name='Ширины уменьшенных копий картинки'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_indexversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PantryIndexChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.PositiveIntegerField(null=True, verbose_name='Рецепт')),
+                ('changed_at', models.DateTimeField(db_index=True, verbose_name='Время изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение индекса продуктов',
+                'verbose_name_plural': 'Изменения индекса продуктов',
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F
 
 from users.models import User
 
@@ -102,15 +103,43 @@ class Recipe(models.Model):
         upload_to='recipes/',
         blank=False
     )
+    image_widths = models.CharField(
+        blank=True,
+        default='',
+        editable=False,
+        max_length=200,
+        verbose_name='Ширины уменьшенных копий картинки'
+    )
+    revision = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия рецепта'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное'
+    )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='recipe_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return f'Рецепт "{self.name}": {self.text[:15]}'
 
+    def bump_revision(self):
+        """Увеличивает версию рецепта после изменения его данных,
+        тегов или ингредиентов."""
+        Recipe.objects.filter(pk=self.pk).update(revision=F('revision') + 1)
+
 
 class IngredientRecipe(models.Model):
     ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
@@ -205,3 +234,192 @@ class UserShoppingRecipe(models.Model):
     def __str__(self):
         return (f'Запись: {self.pk}.{self.recipe} '
                 f'в корзине пользователя {self.user}')
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам из корзины пользователя.
+    Пересчитывается при изменении корзины и рецептов в ней."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Покупатель'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество'
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент из списка покупок'
+        verbose_name_plural = 'Списки покупок пользователей'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_shopping_list_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return (f'{self.ingredient} - {self.total_amount} '
+                f'в списке покупок пользователя {self.user}')
+
+
+class FeedEntry(models.Model):
+    """Запись ленты подписок: рецепт автора, на которого подписан
+    пользователь. Дата и автор копируются из рецепта для чтения ленты
+    по индексу без соединения с рецептами."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_user_feed_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-recipe'],
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте пользователя {self.user}'
+
+
+class RecipeScore(models.Model):
+    """Рейтинг trending рецепта. Хранится в масштабе эпохи
+    TrendingState.epoch: порядок рецептов от масштаба не зависит."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending_score',
+        verbose_name='Рецепт'
+    )
+    score = models.FloatField(default=0, verbose_name='Рейтинг')
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(fields=['-score', 'recipe'],
+                         name='recipe_score_idx')
+        ]
+
+
+class TrendingState(models.Model):
+    """Состояние пересчета рейтинга: до каких записей избранного и
+    корзин он доведен и относительно какого момента хранится."""
+    epoch = models.DateTimeField(verbose_name='Эпоха рейтинга')
+    computed_at = models.DateTimeField(verbose_name='Время пересчета')
+    last_favorite_id = models.PositiveIntegerField(default=0)
+    last_shopping_id = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Состояние рейтинга'
+        verbose_name_plural = 'Состояние рейтинга'
+
+
+class RecipeNeighbor(models.Model):
+    """Похожий рецепт по общим ингредиентам и тегам."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbors',
+        verbose_name='Рецепт'
+    )
+    neighbor = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'neighbor'],
+                name='unique_recipe_neighbor'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['recipe', '-score'],
+                         name='recipe_neighbor_score_idx'),
+            models.Index(fields=['neighbor'],
+                         name='recipe_neighbor_neighbor_idx'),
+        ]
+
+
+class SimilarityVersion(models.Model):
+    """Версия рецепта, по которой посчитаны его похожие рецепты."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='similarity_version',
+        verbose_name='Рецепт'
+    )
+    revision = models.PositiveIntegerField(verbose_name='Версия рецепта')
+
+    class Meta:
+        verbose_name = 'Версия индекса похожих рецептов'
+        verbose_name_plural = 'Версии индекса похожих рецептов'
+
+
+class IndexVersion(models.Model):
+    """Версия индекса в памяти процессов. Меняется вместе с данными
+    индекса, по ней процессы узнают, что свою копию пора обновить."""
+    name = models.CharField(
+        primary_key=True,
+        max_length=50,
+        verbose_name='Индекс'
+    )
+    version = models.CharField(max_length=32, verbose_name='Версия')
+
+    class Meta:
+        verbose_name = 'Версия индекса'
+        verbose_name_plural = 'Версии индексов'
+
+
+class PantryIndexChange(models.Model):
+    """Изменение состава рецепта для индекса продуктов в памяти
+    процессов. Пустой recipe_id - индекс нужно построить заново."""
+    recipe_id = models.PositiveIntegerField(null=True, verbose_name='Рецепт')
+    changed_at = models.DateTimeField(
+        db_index=True,
+        verbose_name='Время изменения'
+    )
+
+    class Meta:
+        verbose_name = 'Изменение индекса продуктов'
+        verbose_name_plural = 'Изменения индекса продуктов'
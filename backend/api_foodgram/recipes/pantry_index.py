@@ -0,0 +1,271 @@
+"""
+Инвертированный индекс ингредиентов для подбора рецептов по продуктам.
+
+Каждому рецепту в индексе соответствует позиция, каждому ингредиенту и
+тегу - битовая маска позиций рецептов (numpy, упакованная по 8 бит).
+Для набора продуктов маски ингредиентов складываются: получается,
+сколько ингредиентов каждого рецепта есть у пользователя, а разница с
+числом ингредиентов рецепта - сколько не хватает. Фильтр по тегам -
+побитовое ИЛИ масок тегов.
+
+Индекс строится при старте процесса (см. wsgi.py) и хранится в памяти.
+После коммита изменения рецепта в таблицу PantryIndexChange пишется его
+id со временем базы. Процесс не чаще раза в INDEX_VERSION_CHECK_SECONDS
+читает записи не старше своей последней записи минус CHANGE_OVERLAP и
+перечитывает рецепты из еще не примененных. Запись без рецепта
+(invalidate_pantry_index) и отставание больше CHANGE_RETENTION заставляют
+построить индекс заново.
+"""
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from recipes.models import (IngredientRecipe, PantryIndexChange, Recipe, Tag,
+                            TagRecipe)
+
+# записи об изменениях могут появиться с небольшим опозданием
+# относительно своего времени, поэтому окно чтения перекрывается
+CHANGE_OVERLAP = timedelta(seconds=30)
+CHANGE_RETENTION = timedelta(days=1)
+# при большем числе изменений индекс дешевле построить заново
+MAX_PATCH_SIZE = 1000
+DEFAULT_MAX_MISSING = 2
+INITIAL_CAPACITY = 1024
+
+
+def mark_recipe_changed(recipe_id):
+    PantryIndexChange.objects.create(recipe_id=recipe_id, changed_at=Now())
+    PantryIndexChange.objects.filter(
+        changed_at__lt=timezone.now() - CHANGE_RETENTION
+    ).delete()
+
+
+def recipe_composition_changed(recipe_id):
+    """Вызывается при записи ингредиентов или тегов рецепта и при его
+    удалении; индекс обновится после коммита транзакции."""
+    transaction.on_commit(lambda: mark_recipe_changed(recipe_id))
+
+
+def invalidate_pantry_index():
+    mark_recipe_changed(None)
+
+
+def read_changes(since=None):
+    """Список (id записи, id рецепта, время) начиная с since."""
+    changes = PantryIndexChange.objects.all()
+    if since is not None:
+        changes = changes.filter(changed_at__gte=since)
+    return list(changes.values_list('id', 'recipe_id', 'changed_at'))
+
+
+def load_compositions(recipe_ids=None):
+    """{id рецепта: (ингредиенты, теги)} для рецептов или для всех."""
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+    compositions = {
+        recipe_id: (set(), set())
+        for recipe_id in recipes.values_list('id', flat=True).iterator()
+    }
+    for position, model, field in ((0, IngredientRecipe, 'ingredient_id'),
+                                   (1, TagRecipe, 'tag_id')):
+        rows = model.objects.filter(recipe__in=recipes).values_list(
+            'recipe_id', field
+        )
+        for recipe_id, value in rows.iterator():
+            # рецепт мог появиться между запросами
+            if recipe_id in compositions:
+                compositions[recipe_id][position].add(value)
+    return compositions
+
+
+class PantryIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._reset(INITIAL_CAPACITY)
+
+    def _reset(self, capacity):
+        self._capacity = capacity
+        self._recipe_ids = np.zeros(capacity, dtype=np.int64)
+        self._sizes = np.zeros(capacity, dtype=np.uint16)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._positions = {}
+        self._free = []
+        self._compositions = {}
+        self._ingredients = {}
+        self._tags = {}
+        # примененные записи об изменениях из окна CHANGE_OVERLAP
+        self._applied = {}
+        self._last_change_at = None
+
+    def _grow(self):
+        capacity = self._capacity * 2
+        extra = capacity - self._capacity
+        self._recipe_ids = np.concatenate(
+            (self._recipe_ids, np.zeros(extra, dtype=np.int64)))
+        self._sizes = np.concatenate(
+            (self._sizes, np.zeros(extra, dtype=np.uint16)))
+        self._alive = np.concatenate((self._alive, np.zeros(extra, bool)))
+        for bitsets in (self._ingredients, self._tags):
+            for key, bits in bitsets.items():
+                bitsets[key] = np.concatenate(
+                    (bits, np.zeros(extra // 8, dtype=np.uint8)))
+        self._capacity = capacity
+
+    def _set_bits(self, bitsets, keys, position, value):
+        byte, mask = position >> 3, np.uint8(0x80 >> (position & 7))
+        for key in keys:
+            bits = bitsets.get(key)
+            if bits is None:
+                bits = bitsets[key] = np.zeros(self._capacity // 8,
+                                               dtype=np.uint8)
+            if value:
+                bits[byte] |= mask
+            else:
+                bits[byte] &= ~mask
+
+    def _remove(self, recipe_id):
+        position = self._positions.pop(recipe_id, None)
+        if position is None:
+            return
+        ingredients, tags = self._compositions.pop(recipe_id)
+        self._set_bits(self._ingredients, ingredients, position, False)
+        self._set_bits(self._tags, tags, position, False)
+        self._sizes[position] = 0
+        self._alive[position] = False
+        self._free.append(position)
+
+    def _add(self, recipe_id, ingredients, tags):
+        if self._free:
+            position = self._free.pop()
+        else:
+            position = len(self._positions)
+            if position >= self._capacity:
+                self._grow()
+        self._positions[recipe_id] = position
+        self._compositions[recipe_id] = (ingredients, tags)
+        self._recipe_ids[position] = recipe_id
+        self._sizes[position] = len(ingredients)
+        self._alive[position] = True
+        self._set_bits(self._ingredients, ingredients, position, True)
+        self._set_bits(self._tags, tags, position, True)
+
+    def _remember(self, changes):
+        for change_id, _, changed_at in changes:
+            self._applied[change_id] = changed_at
+            if (self._last_change_at is None
+                    or changed_at > self._last_change_at):
+                self._last_change_at = changed_at
+        if self._last_change_at is not None:
+            since = self._last_change_at - CHANGE_OVERLAP
+            self._applied = {
+                change_id: changed_at
+                for change_id, changed_at in self._applied.items()
+                if changed_at >= since
+            }
+
+    def _build(self):
+        # изменения читаются до рецептов: то, что закоммитится позже,
+        # попадет в следующую проверку
+        last_change_at = PantryIndexChange.objects.aggregate(
+            last=Max('changed_at')
+        )['last']
+        changes = []
+        if last_change_at is not None:
+            changes = read_changes(last_change_at - CHANGE_OVERLAP)
+        compositions = load_compositions()
+        capacity = INITIAL_CAPACITY
+        while capacity < len(compositions):
+            capacity *= 2
+        self._reset(capacity)
+        for recipe_id, (ingredients, tags) in compositions.items():
+            self._add(recipe_id, ingredients, tags)
+        self._remember(changes)
+
+    def _patch(self, recipe_ids):
+        compositions = load_compositions(recipe_ids)
+        for recipe_id in recipe_ids:
+            self._remove(recipe_id)
+            if recipe_id in compositions:
+                self._add(recipe_id, *compositions[recipe_id])
+
+    def _refresh(self):
+        since = None
+        if self._last_change_at is not None:
+            since = self._last_change_at - CHANGE_OVERLAP
+        changes = [change for change in read_changes(since)
+                   if change[0] not in self._applied]
+        recipe_ids = {recipe_id for _, recipe_id, _ in changes}
+        if None in recipe_ids or len(recipe_ids) > MAX_PATCH_SIZE:
+            self._build()
+            return
+        if recipe_ids:
+            self._patch(recipe_ids)
+        self._remember(changes)
+
+    def ensure_fresh(self):
+        checked_at = self._checked_at
+        now = time.monotonic()
+        if (checked_at is not None and now - checked_at
+                < settings.INDEX_VERSION_CHECK_SECONDS):
+            return
+        with self._lock:
+            if self._checked_at != checked_at:
+                # индекс проверил другой поток
+                return
+            # записи старше CHANGE_RETENTION уже удалены
+            if (checked_at is None or now - checked_at
+                    > (CHANGE_RETENTION - CHANGE_OVERLAP).total_seconds()):
+                self._build()
+            else:
+                self._refresh()
+            self._checked_at = now
+
+    def _unpack(self, bits):
+        return np.unpackbits(bits)[:self._capacity]
+
+    def match(self, ingredient_ids, tag_slugs=(),
+              max_missing=DEFAULT_MAX_MISSING):
+        """Рецепты, в которых есть хотя бы один из ингредиентов и не
+        хватает не больше max_missing: список пар (id рецепта, сколько
+        не хватает), сначала те, где не хватает меньше."""
+        tag_ids = []
+        if tag_slugs:
+            tag_ids = list(Tag.objects.filter(
+                slug__in=tag_slugs
+            ).values_list('id', flat=True))
+        self.ensure_fresh()
+        with self._lock:
+            covered = np.zeros(self._capacity, dtype=np.uint16)
+            for ingredient_id in set(ingredient_ids):
+                bits = self._ingredients.get(ingredient_id)
+                if bits is not None:
+                    covered += self._unpack(bits)
+            mask = self._alive & (covered > 0)
+            if tag_slugs:
+                tagged = np.zeros(self._capacity // 8, dtype=np.uint8)
+                for tag_id in tag_ids:
+                    if tag_id in self._tags:
+                        tagged |= self._tags[tag_id]
+                mask &= self._unpack(tagged).astype(bool)
+            missing = self._sizes.astype(np.int32) - covered
+            mask &= missing <= max_missing
+            positions = np.flatnonzero(mask)
+            recipe_ids = self._recipe_ids[positions]
+            missing = missing[positions]
+            # меньше недостающих, затем больше совпавших, затем новее
+            order = np.lexsort((-recipe_ids, -covered[positions], missing))
+            return list(zip(recipe_ids[order].tolist(),
+                            missing[order].tolist()))
+
+
+pantry_index = PantryIndex()
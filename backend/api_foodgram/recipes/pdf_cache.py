@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+import uuid
+
+import weasyprint
+from django.conf import settings
+
+from api_foodgram.metrics import measure
+from recipes.collect_pdf import (collect_shopping_pdf,
+                                 get_shopping_cart_ingredients)
+
+
+def get_shopping_cart_key(user, ingredients):
+    """Ключ pdf: хеш от всех данных, которые попадают в документ."""
+    content = json.dumps(
+        [user.username, list(ingredients)],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def evict_shopping_cart_cache(keep=None):
+    """Удаляет давно не использованные pdf, пока кеш больше лимита."""
+    entries = []
+    total_size = 0
+    with os.scandir(settings.SHOPPING_CART_CACHE_DIR) as scan:
+        for entry in scan:
+            if not entry.name.endswith('.pdf'):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total_size <= settings.SHOPPING_CART_CACHE_MAX_SIZE:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+
+def get_shopping_cart_pdf(user):
+    """Возвращает путь к pdf со списком покупок пользователя.
+    Документ рендерится только если содержимое корзины изменилось."""
+    ingredients = list(get_shopping_cart_ingredients(user))
+    key = get_shopping_cart_key(user, ingredients)
+    path = os.path.join(settings.SHOPPING_CART_CACHE_DIR, key + '.pdf')
+    if os.path.exists(path):
+        # время изменения файла используется как метка для LRU
+        os.utime(path)
+        return path
+
+    os.makedirs(settings.SHOPPING_CART_CACHE_DIR, exist_ok=True)
+    shopping_cart_html = collect_shopping_pdf(user, ingredients)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with measure('pdf'):
+        weasyprint.HTML(file_obj=shopping_cart_html).write_pdf(
+            target=tmp_path
+        )
+    os.replace(tmp_path, path)
+    evict_shopping_cart_cache(keep=path)
+    return path
@@ -0,0 +1,151 @@
+"""
+Полнотекстовый поиск по названию и описанию рецептов.
+
+На PostgreSQL используется колонка tsvector с русским стеммингом и GIN
+индексом, на SQLite (локальный запуск и тесты) - таблица FTS5. Обе
+структуры обновляются триггерами базы данных при любой записи в таблицу
+рецептов, в том числе при bulk_create.
+
+Индекс создается обработчиком post_migrate, а не миграцией: SQLite
+пересоздает таблицу при изменении ее схемы, и триггеры, созданные
+миграцией, были бы потеряны.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+POSTGRES_INSTALL_SQL = (
+    """
+    ALTER TABLE recipes_recipe
+        ADD COLUMN IF NOT EXISTS search_vector tsvector
+    """,
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger
+        ON recipes_recipe
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+        FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_vector_update()
+    """,
+    """
+    UPDATE recipes_recipe SET name = name WHERE search_vector IS NULL
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_idx
+        ON recipes_recipe USING gin(search_vector)
+    """,
+)
+
+SQLITE_INSTALL_SQL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5(
+        name, text,
+        content='recipes_recipe', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert
+    AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_fts(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete
+    AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update
+    AFTER UPDATE OF name, text ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO recipes_recipe_fts(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+)
+
+
+def install_search_index(connection):
+    if connection.vendor == 'postgresql':
+        statements = POSTGRES_INSTALL_SQL
+    elif connection.vendor == 'sqlite':
+        statements = SQLITE_INSTALL_SQL
+    else:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'recipes_recipe_fts'"
+            )
+            created = cursor.fetchone() is None
+        for statement in statements:
+            cursor.execute(statement)
+        if connection.vendor == 'sqlite' and created:
+            cursor.execute(
+                "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) "
+                "VALUES ('rebuild')"
+            )
+
+
+def get_fts5_query(query):
+    # каждое слово ищется как префикс, кавычки исключают спецсинтаксис FTS5
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(queryset, query):
+    """Оставляет в queryset рецепты, подходящие под запрос, и сортирует
+    их по релевантности (аннотация rank)."""
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        queryset = queryset.annotate(
+            rank=RawSQL(
+                "ts_rank(recipes_recipe.search_vector, "
+                "websearch_to_tsquery('russian', %s))",
+                (query,),
+                output_field=FloatField()
+            ),
+            search_match=RawSQL(
+                "recipes_recipe.search_vector "
+                "@@ websearch_to_tsquery('russian', %s)",
+                (query,),
+                output_field=BooleanField()
+            )
+        ).filter(search_match=True)
+    elif vendor == 'sqlite':
+        fts5_query = get_fts5_query(query)
+        if not fts5_query:
+            return queryset.none()
+        # bm25 тем меньше, чем релевантнее запись
+        queryset = queryset.annotate(
+            rank=RawSQL(
+                "(SELECT -bm25(recipes_recipe_fts) FROM recipes_recipe_fts "
+                "WHERE recipes_recipe_fts MATCH %s "
+                "AND recipes_recipe_fts.rowid = recipes_recipe.id)",
+                (fts5_query,),
+                output_field=FloatField()
+            )
+        ).filter(rank__isnull=False)
+    else:
+        return queryset.filter(Q(name__icontains=query)
+                               | Q(text__icontains=query))
+    return queryset.order_by('-rank', '-pub_date', '-id')
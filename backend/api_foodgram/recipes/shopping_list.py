@@ -0,0 +1,181 @@
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.transaction import TransactionManagementError
+
+from recipes.models import (IngredientRecipe, ShoppingListItem,
+                            UserShoppingRecipe)
+from users.models import User
+
+
+def get_recipe_amounts(recipe_id):
+    """Количество каждого ингредиента в рецепте."""
+    return get_recipes_amounts([recipe_id])
+
+
+def get_recipes_amounts(recipe_ids):
+    """Количество каждого ингредиента во всех рецептах вместе."""
+    return Counter(dict(
+        IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total')
+    ))
+
+
+def get_amounts_delta(old, new):
+    delta = Counter(new)
+    delta.subtract(old)
+    return {
+        ingredient_id: amount for ingredient_id, amount in delta.items()
+        if amount
+    }
+
+
+def lock_shopping_lists(user_ids):
+    # строки пользователей блокируются по возрастанию id, чтобы
+    # параллельные изменения одного списка не создали дубли и не
+    # взаимоблокировались; вне транзакции блокировка сразу снимается
+    if not connection.in_atomic_block:
+        raise TransactionManagementError(
+            'lock_shopping_lists вызывается внутри transaction.atomic'
+        )
+    return list(
+        User.objects.select_for_update().filter(pk__in=user_ids).order_by(
+            'id'
+        ).values_list('id', flat=True)
+    )
+
+
+@transaction.atomic
+def apply_shopping_list_delta(user_ids, delta):
+    """Прибавляет delta {id ингредиента: количество} к списку покупок
+    каждого из пользователей."""
+    if not delta:
+        return
+    user_ids = lock_shopping_lists(user_ids)
+    items = ShoppingListItem.objects.filter(user_id__in=user_ids)
+    existing = set(
+        items.filter(ingredient_id__in=delta).values_list(
+            'user_id', 'ingredient_id'
+        )
+    )
+    for ingredient_id, amount in delta.items():
+        rows = items.filter(ingredient_id=ingredient_id)
+        if amount < 0:
+            # строки, которые обнулились бы, удаляются до вычитания:
+            # total_amount не может быть отрицательным
+            rows.filter(total_amount__lte=-amount).delete()
+        rows.update(total_amount=F('total_amount') + amount)
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id, total_amount=amount
+        )
+        for user_id in user_ids
+        for ingredient_id, amount in delta.items()
+        if amount > 0 and (user_id, ingredient_id) not in existing
+    )
+
+
+@transaction.atomic
+def apply_user_shopping_list_delta(user_id, delta):
+    """То же для одного пользователя, но постоянным числом запросов,
+    сколько бы ингредиентов ни менялось."""
+    if not delta:
+        return
+    lock_shopping_lists([user_id])
+    items = {
+        item.ingredient_id: item for item in ShoppingListItem.objects.filter(
+            user_id=user_id, ingredient_id__in=delta
+        )
+    }
+    created, changed, removed = [], [], []
+    for ingredient_id, amount in delta.items():
+        item = items.get(ingredient_id)
+        if item is None:
+            if amount > 0:
+                created.append(ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    total_amount=amount
+                ))
+        elif item.total_amount + amount > 0:
+            item.total_amount += amount
+            changed.append(item)
+        else:
+            removed.append(item.pk)
+    if removed:
+        ShoppingListItem.objects.filter(pk__in=removed).delete()
+    if changed:
+        ShoppingListItem.objects.bulk_update(changed, ['total_amount'])
+    ShoppingListItem.objects.bulk_create(created)
+
+
+def add_recipes_to_shopping_list(user_id, recipe_ids):
+    apply_user_shopping_list_delta(user_id, get_recipes_amounts(recipe_ids))
+
+
+def remove_recipes_from_shopping_list(user_id, recipe_ids):
+    apply_user_shopping_list_delta(
+        user_id, get_amounts_delta(get_recipes_amounts(recipe_ids), {})
+    )
+
+
+def add_recipe_to_shopping_list(user_id, recipe_id):
+    apply_shopping_list_delta([user_id], get_recipe_amounts(recipe_id))
+
+
+def remove_recipe_from_shopping_list(user_id, recipe_id):
+    apply_shopping_list_delta(
+        [user_id], get_amounts_delta(get_recipe_amounts(recipe_id), {})
+    )
+
+
+def recipe_amounts_changed(recipe_id, old, new):
+    """Переносит изменение ингредиентов рецепта во все корзины с ним."""
+    delta = get_amounts_delta(old, new)
+    if not delta:
+        return
+    apply_shopping_list_delta(
+        UserShoppingRecipe.objects.filter(recipe_id=recipe_id).values_list(
+            'user_id', flat=True
+        ),
+        delta
+    )
+
+
+def get_live_shopping_lists(user_ids):
+    """Списки покупок, посчитанные заново по корзинам пользователей."""
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in IngredientRecipe.objects.filter(
+            recipe__shopping_recipes__user__in=user_ids
+        ).order_by().values(
+            'recipe__shopping_recipes__user', 'ingredient_id'
+        ).annotate(total=Sum('amount')).values_list(
+            'recipe__shopping_recipes__user', 'ingredient_id', 'total'
+        )
+    }
+
+
+def get_stored_shopping_lists(user_ids):
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in
+        ShoppingListItem.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'ingredient_id', 'total_amount'
+        )
+    }
+
+
+def rebuild_shopping_lists(user_ids):
+    """Перезаписывает списки покупок по живому агрегату корзин."""
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id, total_amount=total
+        )
+        for (user_id, ingredient_id), total in
+        get_live_shopping_lists(user_ids).items()
+    )
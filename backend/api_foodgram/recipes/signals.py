@@ -0,0 +1,123 @@
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.signals import (post_delete, post_init, post_migrate,
+                                      post_save, pre_delete)
+from django.dispatch import receiver
+
+from recipes.feed import (remove_author_from_feed, schedule_backfill,
+                          schedule_fan_out, schedule_restore)
+from recipes.images import schedule_derivatives
+from recipes.index_version import REFERENCES, bump_index_version
+from recipes.ingredient_index import invalidate_ingredient_index
+from recipes.models import (Ingredient, Recipe, Tag, UserFavoriteRecipe,
+                            UserShoppingRecipe)
+from recipes.pantry_index import recipe_composition_changed
+from recipes.search import install_search_index
+from recipes.shopping_list import (add_recipe_to_shopping_list,
+                                   remove_recipe_from_shopping_list)
+from users.models import Follow, User
+from users.utils import change_counter
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    invalidate_ingredient_index()
+    bump_index_version(REFERENCES)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_index_version(REFERENCES)
+
+
+def get_loaded_image_name(instance):
+    # значение берется из __dict__, чтобы не загружать отложенное поле
+    image = instance.__dict__.get('image')
+    return getattr(image, 'name', image)
+
+
+def release_image(name):
+    release = getattr(default_storage, 'release', None)
+    if name and release is not None:
+        transaction.on_commit(lambda: release(name))
+
+
+@receiver(post_init, sender=Recipe)
+def recipe_loaded(sender, instance, **kwargs):
+    instance._loaded_image_name = get_loaded_image_name(instance)
+    instance._loaded_author_id = instance.__dict__.get('author_id')
+
+
+def update_author_recipes_count(instance, created):
+    author_id = instance.author_id
+    if created:
+        change_counter(User, author_id, 'recipes_count', 1)
+    elif instance._loaded_author_id not in (None, author_id):
+        change_counter(User, instance._loaded_author_id, 'recipes_count', -1)
+        change_counter(User, author_id, 'recipes_count', 1)
+    instance._loaded_author_id = author_id
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, raw, **kwargs):
+    if not raw:
+        update_author_recipes_count(instance, created)
+        if created:
+            schedule_fan_out(instance)
+    # копии пересоздаются, только если картинка сменилась
+    image_name = get_loaded_image_name(instance)
+    if image_name and (created
+                       or image_name != instance._loaded_image_name):
+        schedule_derivatives(instance)
+        if not created:
+            release_image(instance._loaded_image_name)
+    instance._loaded_image_name = image_name
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    recipe_composition_changed(instance.pk)
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+    release_image(get_loaded_image_name(instance))
+
+
+@receiver(post_save, sender=UserFavoriteRecipe)
+def favorite_added(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=UserFavoriteRecipe)
+def favorite_removed(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=UserShoppingRecipe)
+def shopping_recipe_added(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        add_recipe_to_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=UserShoppingRecipe)
+def shopping_recipe_removed(sender, instance, **kwargs):
+    # pre_delete: при каскадном удалении рецепта его ингредиенты
+    # еще не удалены и их количество можно вычесть
+    remove_recipe_from_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        schedule_backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    remove_author_from_feed(instance.user_id, instance.author_id)
+    schedule_restore(instance)
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using, **kwargs):
+    if sender.name == 'recipes':
+        install_search_index(connections[using])
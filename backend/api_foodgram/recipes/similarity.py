@@ -0,0 +1,195 @@
+"""
+Индекс похожих рецептов.
+
+Рецепты описываются разреженной матрицей рецепт x (ингредиенты и теги)
+с весами idf: редкие ингредиенты важнее соли и воды, а ингредиенты,
+которые есть в большой доле рецептов, не учитываются совсем. Строки
+нормируются, и сходство двух рецептов - косинус между строками.
+Для порции строк произведение на транспонированную матрицу считается в
+scipy, из каждой строки берутся SIMILAR_RECIPES_COUNT лучших соседей, и
+результат записывается в RecipeNeighbor. Запрос похожих рецептов - одно
+чтение по индексу этой таблицы.
+
+При обновлении пересчитываются только измененные рецепты (их revision
+не совпадает с SimilarityVersion) и рецепты, в чьих списках они могут
+появиться или из них пропасть. Веса idf при этом тоже меняются, но у
+остальных рецептов сходство не пересчитывается, поэтому время от времени
+нужен полный пересчет.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from scipy import sparse
+
+from recipes.models import (IngredientRecipe, Recipe, RecipeNeighbor,
+                            SimilarityVersion, TagRecipe)
+
+TAG_WEIGHT = 0.5
+# ингредиенты из большей доли рецептов не учитываются
+MAX_DOCUMENT_FREQUENCY = 0.2
+MIN_DOCUMENT_FREQUENCY_LIMIT = 100
+BATCH_SIZE = 256
+QUERY_BATCH_SIZE = 1000
+
+
+def get_rows(recipe_ids, ids):
+    """Номера строк матрицы для id рецептов, которые в ней есть."""
+    ids = np.asarray(ids, dtype=np.int64)
+    return np.searchsorted(recipe_ids, ids[np.isin(ids, recipe_ids)])
+
+
+def chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def load_pairs(queryset, field):
+    pairs = np.array(
+        list(queryset.values_list('recipe_id', field).iterator()),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    return np.unique(pairs, axis=0)
+
+
+def build_matrix():
+    """Возвращает id рецептов, их revision и нормированную матрицу."""
+    recipes = np.array(
+        list(Recipe.objects.order_by('id').values_list('id', 'revision')),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    recipe_ids, revisions = recipes[:, 0], recipes[:, 1]
+    ingredients = load_pairs(IngredientRecipe.objects.all(), 'ingredient_id')
+    tags = load_pairs(TagRecipe.objects.all(), 'tag_id')
+    # пары удаленных во время загрузки рецептов отбрасываются
+    ingredients = ingredients[np.isin(ingredients[:, 0], recipe_ids)]
+    tags = tags[np.isin(tags[:, 0], recipe_ids)]
+
+    tag_offset = int(ingredients[:, 1].max(initial=0)) + 1
+    rows = np.concatenate((ingredients[:, 0], tags[:, 0]))
+    columns = np.concatenate((ingredients[:, 1], tags[:, 1] + tag_offset))
+    data = np.concatenate((np.ones(len(ingredients)),
+                           np.full(len(tags), TAG_WEIGHT)))
+    matrix = sparse.csr_matrix(
+        (data, (np.searchsorted(recipe_ids, rows), columns)),
+        shape=(len(recipe_ids),
+               max(tag_offset, int(columns.max(initial=0)) + 1))
+    )
+
+    count = max(len(recipe_ids), 1)
+    frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    limit = max(MAX_DOCUMENT_FREQUENCY * count, MIN_DOCUMENT_FREQUENCY_LIMIT)
+    idf = np.where(
+        (frequency > 0) & (frequency <= limit),
+        np.log(count / np.maximum(frequency, 1)) + 1,
+        0
+    )
+    matrix = matrix @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    matrix = sparse.diags(1 / np.where(norms > 0, norms, 1)) @ matrix
+    return recipe_ids, revisions, matrix.tocsr()
+
+
+def top_neighbors(matrix, rows, count):
+    """Для каждой строки из rows - номера и сходство count лучших
+    соседей по убыванию сходства."""
+    product = (matrix[rows] @ matrix.T).tocsr()
+    for position, row in enumerate(rows):
+        start, end = product.indptr[position], product.indptr[position + 1]
+        columns = product.indices[start:end]
+        scores = product.data[start:end]
+        keep = (columns != row) & (scores > 0)
+        columns, scores = columns[keep], scores[keep]
+        if len(scores) > count:
+            best = np.argpartition(-scores, count - 1)[:count]
+            columns, scores = columns[best], scores[best]
+        order = np.lexsort((columns, -scores))
+        yield row, columns[order], scores[order]
+
+
+@transaction.atomic
+def save_neighbors(recipe_ids, revisions, matrix, rows, count):
+    batch_ids = [int(recipe_ids[row]) for row in rows]
+    RecipeNeighbor.objects.filter(recipe_id__in=batch_ids).delete()
+    RecipeNeighbor.objects.bulk_create(
+        RecipeNeighbor(recipe_id=int(recipe_ids[row]),
+                       neighbor_id=int(recipe_ids[column]),
+                       score=float(score))
+        for row, columns, scores in top_neighbors(matrix, rows, count)
+        for column, score in zip(columns, scores)
+    )
+    SimilarityVersion.objects.filter(recipe_id__in=batch_ids).delete()
+    SimilarityVersion.objects.bulk_create(
+        SimilarityVersion(recipe_id=int(recipe_ids[row]),
+                          revision=int(revisions[row]))
+        for row in rows
+    )
+
+
+def get_changed_rows(recipe_ids, revisions):
+    versions = dict(SimilarityVersion.objects.values_list(
+        'recipe_id', 'revision'
+    ))
+    return [
+        row for row, (recipe_id, revision) in
+        enumerate(zip(recipe_ids.tolist(), revisions.tolist()))
+        if versions.get(recipe_id) != revision
+    ]
+
+
+def get_affected_rows(recipe_ids, matrix, changed_rows, count):
+    """Строки, списки соседей которых могут измениться из-за
+    измененных рецептов."""
+    affected = set(changed_rows)
+    changed_ids = recipe_ids[changed_rows].tolist()
+    for batch in chunks(changed_ids, QUERY_BATCH_SIZE):
+        listed = RecipeNeighbor.objects.filter(
+            neighbor_id__in=batch
+        ).values_list('recipe_id', flat=True)
+        affected.update(get_rows(recipe_ids, list(listed)).tolist())
+
+    # лучшее сходство каждого рецепта с любым из измененных
+    best = np.zeros(len(recipe_ids))
+    for rows in chunks(changed_rows, BATCH_SIZE):
+        product = matrix[rows] @ matrix.T
+        best = np.maximum(best, product.max(axis=0).toarray().ravel())
+    candidates = np.flatnonzero(best)
+    for batch in chunks(candidates.tolist(), QUERY_BATCH_SIZE):
+        stored = {
+            recipe_id: (total, lowest) for recipe_id, total, lowest in
+            RecipeNeighbor.objects.filter(
+                recipe_id__in=recipe_ids[batch].tolist()
+            ).values('recipe_id').annotate(
+                total=Count('id'), lowest=Min('score')
+            ).values_list('recipe_id', 'total', 'lowest')
+        }
+        for row in batch:
+            total, lowest = stored.get(int(recipe_ids[row]), (0, 0))
+            if total < count or best[row] > lowest:
+                affected.add(row)
+    return sorted(affected)
+
+
+def update_similar_recipes(full=False):
+    """Пересчитывает похожие рецепты. Возвращает число рецептов, для
+    которых списки были записаны заново."""
+    count = settings.SIMILAR_RECIPES_COUNT
+    recipe_ids, revisions, matrix = build_matrix()
+    if full:
+        rows = list(range(len(recipe_ids)))
+    else:
+        changed_rows = get_changed_rows(recipe_ids, revisions)
+        if not changed_rows:
+            return 0
+        rows = get_affected_rows(recipe_ids, matrix, changed_rows, count)
+    for batch in chunks(rows, BATCH_SIZE):
+        save_neighbors(recipe_ids, revisions, matrix, batch, count)
+    return len(rows)
+
+
+def get_similar_recipes(recipe_id):
+    return [
+        item.neighbor for item in RecipeNeighbor.objects.filter(
+            recipe_id=recipe_id
+        ).select_related('neighbor').order_by('-score', 'neighbor_id')
+    ]
@@ -0,0 +1,64 @@
+"""
+Хранилище файлов с именами по хешу содержимого.
+
+Одинаковые картинки сохраняются один раз: имя файла - sha256 содержимого,
+и если такой файл уже есть, запись пропускается. Счетчиком ссылок служит
+число рецептов с этим именем в базе: файл удаляется, когда на него не
+ссылается ни один рецепт и к нему давно не обращались.
+"""
+import hashlib
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentHashStorage(FileSystemStorage):
+
+    def get_hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest.hexdigest() + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_hashed_name(name, content)
+        if self.exists(name):
+            # отметка о свежем использовании защищает файл от удаления,
+            # пока рецепт с ним еще не сохранен в базе
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    def get_reference_count(self, name):
+        from recipes.models import Recipe
+        return Recipe.objects.filter(image=name).count()
+
+    def is_recently_used(self, name):
+        try:
+            modified = os.path.getmtime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return time.time() - modified < settings.MEDIA_BLOB_GRACE_PERIOD
+
+    def release(self, name):
+        """Удаляет файл и его уменьшенные копии, если на него
+        больше нет ссылок."""
+        from recipes.images import derivative_dir
+
+        if (not name or self.get_reference_count(name)
+                or self.is_recently_used(name)):
+            return False
+        self.delete(name)
+        shutil.rmtree(self.path(derivative_dir(name)), ignore_errors=True)
+        return True
@@ -0,0 +1,116 @@
+"""
+Рейтинг trending: добавления в избранное и корзину с затуханием во времени.
+
+Вклад добавления уменьшается вдвое за TRENDING_HALF_LIFE_HOURS. Рейтинги
+хранятся умноженными на 2 ** (t / half_life) относительно эпохи
+TrendingState.epoch, поэтому новые добавления только прибавляются к
+рейтингу своих рецептов, а старые рейтинги не пересчитываются: общий
+множитель не меняет порядок. Когда множитель становится слишком большим,
+все рейтинги один раз делятся на него и эпоха сдвигается.
+
+Записи избранного и корзины не хранят время добавления, поэтому новыми
+считаются записи с id больше сохраненного, а временем их добавления -
+время пересчета. При пересчете раз в несколько минут ошибка мала по
+сравнению с периодом полураспада. Удаления из избранного и корзины
+рейтинг не уменьшают.
+"""
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from recipes.models import (Recipe, RecipeScore, TrendingState,
+                            UserFavoriteRecipe, UserShoppingRecipe)
+
+FAVORITE_WEIGHT = 1.0
+SHOPPING_WEIGHT = 0.5
+BATCH_SIZE = 10000
+WRITE_BATCH_SIZE = 1000
+MAX_SCALE = 2.0 ** 30
+
+
+def get_scale(epoch, now):
+    hours = (now - epoch).total_seconds() / 3600
+    return 2.0 ** (hours / settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def count_new_records(model, last_id, max_id):
+    """Число записей с id из (last_id, max_id] по рецептам. Диапазон
+    читается частями, память зависит только от числа рецептов."""
+    counts = Counter()
+    while last_id < max_id:
+        upper = min(last_id + BATCH_SIZE, max_id)
+        counts.update(dict(
+            model.objects.filter(
+                id__gt=last_id, id__lte=upper
+            ).order_by().values('recipe_id').annotate(
+                total=Count('id')
+            ).values_list('recipe_id', 'total')
+        ))
+        last_id = upper
+    return counts
+
+
+def add_scores(deltas):
+    # новые записи обычно добавляют рецептам одинаковые вклады,
+    # поэтому рецепты обновляются группами по величине вклада
+    by_delta = defaultdict(list)
+    for recipe_id, delta in deltas.items():
+        by_delta[delta].append(recipe_id)
+    for delta, recipe_ids in by_delta.items():
+        for start in range(0, len(recipe_ids), WRITE_BATCH_SIZE):
+            batch = recipe_ids[start:start + WRITE_BATCH_SIZE]
+            scores = RecipeScore.objects.filter(recipe_id__in=batch)
+            existing = set(scores.values_list('recipe_id', flat=True))
+            scores.update(score=F('score') + delta)
+            RecipeScore.objects.bulk_create(
+                RecipeScore(recipe_id=recipe_id, score=delta)
+                for recipe_id in Recipe.objects.filter(
+                    id__in=[pk for pk in batch if pk not in existing]
+                ).values_list('id', flat=True)
+            )
+
+
+def get_trending_state(now):
+    state = TrendingState.objects.select_for_update().filter(pk=1).first()
+    if state is None:
+        state = TrendingState.objects.create(pk=1, epoch=now,
+                                             computed_at=now)
+    return state
+
+
+@transaction.atomic
+def update_trending_scores(now=None):
+    """Добавляет к рейтингам записи избранного и корзин, появившиеся
+    после прошлого пересчета. Возвращает число изменившихся рецептов."""
+    now = now or timezone.now()
+    state = get_trending_state(now)
+    scale = get_scale(state.epoch, now)
+    if scale > MAX_SCALE:
+        RecipeScore.objects.update(score=F('score') / scale)
+        state.epoch = now
+        scale = 1.0
+
+    deltas = Counter()
+    for model, weight, last_field in (
+            (UserFavoriteRecipe, FAVORITE_WEIGHT, 'last_favorite_id'),
+            (UserShoppingRecipe, SHOPPING_WEIGHT, 'last_shopping_id'),
+    ):
+        max_id = model.objects.aggregate(last=Max('id'))['last'] or 0
+        counts = count_new_records(model, getattr(state, last_field), max_id)
+        for recipe_id, total in counts.items():
+            deltas[recipe_id] += total * weight * scale
+        setattr(state, last_field, max(max_id, getattr(state, last_field)))
+
+    add_scores(deltas)
+    state.computed_at = now
+    state.save()
+    return len(deltas)
+
+
+def order_by_trending(queryset):
+    return queryset.order_by(
+        F('trending_score__score').desc(nulls_last=True), '-pub_date', '-id'
+    )
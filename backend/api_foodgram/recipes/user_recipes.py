@@ -0,0 +1,83 @@
+"""
+Добавление и удаление сразу нескольких рецептов в избранном и корзине.
+
+Записи создаются одним bulk_create и удаляются одним DELETE, поэтому
+сигналы post_save и post_delete не отправляются: счетчики избранного и
+список покупок обновляются здесь же, тоже постоянным числом запросов.
+"""
+from django.db import connection, transaction
+
+from recipes.models import Recipe, UserFavoriteRecipe, UserShoppingRecipe
+from recipes.shopping_list import (add_recipes_to_shopping_list,
+                                   lock_shopping_lists,
+                                   remove_recipes_from_shopping_list)
+from users.utils import change_counters
+
+
+def favorites_added(user_id, recipe_ids):
+    change_counters(Recipe, recipe_ids, 'favorites_count', 1)
+
+
+def favorites_removed(user_id, recipe_ids):
+    change_counters(Recipe, recipe_ids, 'favorites_count', -1)
+
+
+# то, что сигналы делают для одной записи
+HANDLERS = {
+    UserFavoriteRecipe: (favorites_added, favorites_removed),
+    UserShoppingRecipe: (add_recipes_to_shopping_list,
+                         remove_recipes_from_shopping_list),
+}
+
+
+def delete_records(model, user_id, recipe_ids):
+    """Один DELETE без загрузки записей и без сигналов."""
+    opts = model._meta
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(opts.db_table)} '
+            f'WHERE {quote(opts.get_field("user").column)} = %s '
+            f'AND {quote(opts.get_field("recipe").column)} '
+            f'IN ({placeholders})',
+            [user_id, *recipe_ids]
+        )
+
+
+def get_user_recipe_ids(model, user_id, recipe_ids=None):
+    records = model.objects.filter(user_id=user_id)
+    if recipe_ids is not None:
+        records = records.filter(recipe_id__in=recipe_ids)
+    return set(records.values_list('recipe_id', flat=True))
+
+
+@transaction.atomic
+def add_user_recipes(model, user_id, recipe_ids):
+    """Добавляет рецепты в избранное или корзину пользователя.
+    Возвращает id всех рецептов в списке после изменения."""
+    # строка пользователя блокируется: параллельный запрос того же
+    # пользователя не посчитает одни и те же рецепты новыми дважды
+    lock_shopping_lists([user_id])
+    added = set(recipe_ids) - get_user_recipe_ids(model, user_id, recipe_ids)
+    if added:
+        model.objects.bulk_create(
+            (model(user_id=user_id, recipe_id=recipe_id)
+             for recipe_id in added),
+            ignore_conflicts=True
+        )
+        HANDLERS[model][0](user_id, added)
+    return get_user_recipe_ids(model, user_id)
+
+
+@transaction.atomic
+def delete_user_recipes(model, user_id, recipe_ids):
+    """Удаляет рецепты из избранного или корзины пользователя.
+    Возвращает id оставшихся рецептов."""
+    lock_shopping_lists([user_id])
+    records = model.objects.filter(user_id=user_id, recipe_id__in=recipe_ids)
+    removed = set(records.values_list('recipe_id', flat=True))
+    if removed:
+        HANDLERS[model][1](user_id, removed)
+        delete_records(model, user_id, removed)
+    return get_user_recipe_ids(model, user_id)
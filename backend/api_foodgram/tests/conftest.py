@@ -0,0 +1,131 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes import pdf_cache
+from recipes.models import (Ingredient, IngredientRecipe, Recipe, Tag,
+                            TagRecipe, UserFavoriteRecipe, UserShoppingRecipe)
+from users.models import Follow, User
+
+PASSWORD = 'Foodgram-test-1'
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # кеш процесса общий для тестов: версии индексов, метки и токены
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        password=PASSWORD, first_name=username.title(), last_name='Test'
+    )
+
+
+def create_recipes(author, count, tags, ingredients):
+    recipes = []
+    for number in range(count):
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {author.username} {number}',
+            text='Описание', cooking_time=10 + number,
+            image='recipes/test.png'
+        )
+        for tag in tags:
+            TagRecipe.objects.create(recipe=recipe, tag=tag)
+        for amount, ingredient in enumerate(ingredients, start=1):
+            IngredientRecipe.objects.create(recipe=recipe,
+                                            ingredient=ingredient,
+                                            amount=amount * 100)
+        recipes.append(recipe)
+    return recipes
+
+
+@pytest.fixture
+def user():
+    return create_user('reader')
+
+
+@pytest.fixture
+def author():
+    return create_user('author')
+
+
+@pytest.fixture
+def token(user):
+    return Token.objects.create(user=user)
+
+
+@pytest.fixture
+def guest_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=author).key}'
+    )
+    return client
+
+
+@pytest.fixture
+def tags():
+    return [
+        Tag.objects.create(name='Завтрак', slug='breakfast',
+                           color='#ebe234'),
+        Tag.objects.create(name='Обед', slug='lunch', color='#34eb37'),
+    ]
+
+
+@pytest.fixture
+def ingredients():
+    return [
+        Ingredient.objects.create(name=name, measurement_unit=unit)
+        for name, unit in (('мука', 'г'), ('молоко', 'мл'), ('яйца', 'шт'))
+    ]
+
+
+@pytest.fixture
+def recipes(author, user, tags, ingredients):
+    """Рецепты двух авторов; у пользователя user есть подписка,
+    избранное и корзина, чтобы флаги в ответах были разными."""
+    other = create_user('other')
+    recipes = (create_recipes(author, 6, tags, ingredients)
+               + create_recipes(other, 6, tags[:1], ingredients[:2]))
+    Follow.objects.create(user=user, author=author)
+    for recipe in recipes[::3]:
+        UserFavoriteRecipe.objects.create(user=user, recipe=recipe)
+    for recipe in recipes[1::4]:
+        UserShoppingRecipe.objects.create(user=user, recipe=recipe)
+    return recipes
+
+
+@pytest.fixture
+def rendered_pdfs(settings, tmp_path, monkeypatch):
+    """Подменяет weasyprint и запоминает отрендеренные документы."""
+    settings.SHOPPING_CART_CACHE_DIR = str(tmp_path / 'pdf')
+    documents = []
+
+    class HTML:
+        def __init__(self, file_obj):
+            self.html = file_obj
+
+        def write_pdf(self, target):
+            documents.append(self.html)
+            with open(target, 'wb') as pdf:
+                pdf.write(b'%PDF ' + self.html.encode())
+
+    monkeypatch.setattr(pdf_cache.weasyprint, 'HTML', HTML)
+    return documents
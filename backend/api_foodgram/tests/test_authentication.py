@@ -0,0 +1,94 @@
+import time
+
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.authentication import TokenCache, token_cache
+
+from tests.conftest import PASSWORD
+
+ME_URL = '/api/users/me/'
+LOGIN_URL = '/api/auth/token/login/'
+LOGOUT_URL = '/api/auth/token/logout/'
+SET_PASSWORD_URL = '/api/users/set_password/'
+
+# выход, смена пароля и удаление пользователя сбрасывают кеш после
+# коммита, поэтому тесты идут без общей транзакции
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def login_client(user):
+    response = APIClient().post(LOGIN_URL, {'email': user.email,
+                                            'password': PASSWORD})
+    assert response.status_code == 200
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}'
+    )
+    assert client.get(ME_URL).status_code == 200
+    return client
+
+
+def cached_keys(user):
+    return [key for key in Token.objects.filter(
+        user=user
+    ).values_list('key', flat=True) if token_cache.get(key) is not None]
+
+
+def test_logout_revokes_cached_token(login_client):
+    assert login_client.post(LOGOUT_URL).status_code == 204
+    assert login_client.get(ME_URL).status_code == 401
+
+
+def test_password_change_drops_cached_user(user, login_client):
+    assert cached_keys(user)
+    response = login_client.post(SET_PASSWORD_URL, {
+        'current_password': PASSWORD,
+        'new_password': 'Foodgram-test-2',
+    })
+    assert response.status_code == 204
+    assert not cached_keys(user)
+    assert login_client.get(ME_URL).status_code == 200
+
+
+def test_login_keeps_cached_tokens(user, login_client):
+    keys = cached_keys(user)
+    # вход сохраняет пользователю last_login
+    response = APIClient().post(LOGIN_URL, {'email': user.email,
+                                            'password': PASSWORD})
+    assert response.status_code == 200
+    assert cached_keys(user) == keys
+
+
+def test_deactivation_revokes_cached_token(user, login_client):
+    user.is_active = False
+    user.save()
+    assert login_client.get(ME_URL).status_code == 401
+
+
+def test_user_deletion_revokes_cached_token(user, login_client):
+    user.delete()
+    assert login_client.get(ME_URL).status_code == 401
+
+
+def test_shared_cache_sees_logout_from_other_process(settings, user,
+                                                     login_client):
+    settings.AUTH_TOKEN_CACHE_ALIAS = 'default'
+    assert login_client.get(ME_URL).status_code == 200
+    key = Token.objects.get(user=user).key
+    # другой процесс со своим экземпляром кеша
+    other_process = TokenCache()
+    assert other_process.get(key) is not None
+    assert login_client.post(LOGOUT_URL).status_code == 204
+    assert other_process.get(key) is None
+
+
+def test_local_cache_entries_expire(settings, user, token):
+    settings.AUTH_TOKEN_LOCAL_CACHE_TTL = 1
+    cache = TokenCache()
+    cache.set(token.key, (user, token))
+    assert cache.get(token.key) == (user, token)
+    time.sleep(1.1)
+    assert cache.get(token.key) is None
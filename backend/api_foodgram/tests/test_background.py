@@ -0,0 +1,22 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from recipes.background import run_in_background
+
+
+def broken_task(value):
+    raise ValueError(value)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_task_errors_are_logged(caplog):
+    executor = ThreadPoolExecutor(max_workers=1)
+    with caplog.at_level(logging.ERROR, logger='recipes.background'):
+        # вне транзакции задача сразу ставится в пул
+        run_in_background(executor, broken_task, 42)
+        executor.shutdown(wait=True)
+    [record] = caplog.records
+    assert 'broken_task' in record.getMessage()
+    assert record.exc_info[0] is ValueError
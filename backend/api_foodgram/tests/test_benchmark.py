@@ -0,0 +1,57 @@
+"""
+Быстрый прогон seed_synthetic и benchmark_endpoints со сравнением
+с прошлым результатом.
+"""
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from recipes.management.commands import benchmark_endpoints
+from recipes.models import Recipe
+from users.models import User
+
+BENCHMARK_OPTIONS = ('--iterations', '2', '--warmup', '1')
+
+
+@pytest.fixture
+def synthetic(monkeypatch, rendered_pdfs):
+    # тестовое окружение уже настроено pytest-django
+    monkeypatch.setattr(benchmark_endpoints, 'setup_test_environment',
+                        lambda: None)
+    monkeypatch.setattr(benchmark_endpoints, 'teardown_test_environment',
+                        lambda: None)
+    call_command('seed_synthetic', '--users', '20', '--recipes', '40',
+                 '--ingredients', '30', '--follows', '3', '--favorites',
+                 '5', '--cart', '3', stdout=StringIO())
+
+
+@pytest.mark.django_db
+def test_seed_and_benchmark(tmp_path, synthetic):
+    assert User.objects.count() == 20
+    assert Recipe.objects.count() == 40
+    baseline = tmp_path / 'baseline.json'
+    call_command('benchmark_endpoints', *BENCHMARK_OPTIONS,
+                 '--output', str(baseline), stderr=StringIO())
+    result = json.loads(baseline.read_text(encoding='utf-8'))
+    assert result['meta']['recipes'] == 40
+    statuses = {name: scenario['status']
+                for name, scenario in result['scenarios'].items()}
+    assert set(statuses.values()) == {200}, statuses
+
+    stdout = StringIO()
+    call_command('benchmark_endpoints', *BENCHMARK_OPTIONS,
+                 '--baseline', str(baseline), '--max-slowdown', '1000',
+                 '--output', str(tmp_path / 'result.json'),
+                 stdout=stdout, stderr=StringIO())
+    assert 'Замедлений относительно' in stdout.getvalue()
+
+    # в сохраненном результате запросов меньше: прогон падает
+    result['scenarios']['recipe detail']['queries'] -= 1
+    baseline.write_text(json.dumps(result), encoding='utf-8')
+    with pytest.raises(CommandError, match='recipe detail: запросов'):
+        call_command('benchmark_endpoints', *BENCHMARK_OPTIONS,
+                     '--baseline', str(baseline), '--max-slowdown', '1000',
+                     '--output', str(tmp_path / 'result.json'),
+                     stderr=StringIO())
@@ -0,0 +1,80 @@
+"""
+Хранимые счетчики совпадают с числом связанных записей после любых
+изменений, а reconcile_counters исправляет разошедшиеся.
+"""
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Recipe, UserFavoriteRecipe
+from tests.conftest import create_recipes, create_user
+from users.models import Follow, User
+
+FAVORITE_URL = '/api/recipes/{}/favorite/'
+BULK_FAVORITE_URL = '/api/recipes/favorite/'
+
+
+def assert_counters():
+    for recipe in Recipe.objects.all():
+        assert recipe.favorites_count == recipe.favorite_recipes.count()
+    for user in User.objects.all():
+        assert user.recipes_count == Recipe.objects.filter(
+            author=user
+        ).count()
+        assert user.followers_count == Follow.objects.filter(
+            author=user
+        ).count()
+
+
+@pytest.mark.django_db
+def test_counters_after_create_and_delete(user, author, recipes, tags,
+                                          ingredients):
+    assert_counters()
+    extra, = create_recipes(author, 1, tags, ingredients)
+    UserFavoriteRecipe.objects.create(user=author, recipe=extra)
+    Follow.objects.create(user=recipes[-1].author, author=author)
+    assert_counters()
+    UserFavoriteRecipe.objects.filter(user=author).delete()
+    Follow.objects.filter(user=user).delete()
+    recipes[0].delete()
+    assert_counters()
+
+
+@pytest.mark.django_db
+def test_counters_after_cascade(user, author, recipes):
+    # избранное и подписки пользователя удаляются каскадом
+    user.delete()
+    assert_counters()
+    assert User.objects.get(pk=author.pk).followers_count == 0
+    author.delete()
+    assert_counters()
+
+
+@pytest.mark.django_db
+def test_counters_after_api(user_client, recipes):
+    recipe_ids = [recipe.pk for recipe in recipes[:6]]
+    response = user_client.post(BULK_FAVORITE_URL, {'recipes': recipe_ids},
+                                format='json')
+    assert response.status_code == 200
+    assert_counters()
+    response = user_client.delete(BULK_FAVORITE_URL,
+                                  {'recipes': recipe_ids[:4]},
+                                  format='json')
+    assert not set(recipe_ids[:4]) & set(response.data['recipes'])
+    assert_counters()
+    assert user_client.post(FAVORITE_URL.format(recipes[7].pk)
+                            ).status_code == 201
+    assert user_client.delete(FAVORITE_URL.format(recipes[0].pk)
+                              ).status_code == 204
+    assert_counters()
+
+
+@pytest.mark.django_db
+def test_reconcile_counters(user, author, recipes):
+    other = create_user('spare')
+    Recipe.objects.filter(pk=recipes[0].pk).update(favorites_count=40)
+    Recipe.objects.filter(pk=recipes[3].pk).update(favorites_count=0)
+    User.objects.filter(pk=author.pk).update(recipes_count=1,
+                                             followers_count=7)
+    User.objects.filter(pk=other.pk).update(followers_count=3)
+    call_command('reconcile_counters', '--batch-size', '2')
+    assert_counters()
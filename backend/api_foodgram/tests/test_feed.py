@@ -0,0 +1,70 @@
+import pytest
+
+from recipes.feed import fan_out_recipe, restore_author_feeds
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow, User
+
+URL = '/api/recipes/feed/'
+
+
+def feed_ids(client):
+    response = client.get(URL)
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+@pytest.mark.django_db
+def test_feed_keeps_recipes_when_author_drops_to_threshold(
+        settings, user, user_client, author):
+    settings.FEED_FANOUT_MAX_FOLLOWERS = 1
+    Follow.objects.create(user=user, author=author)
+    other = Follow.objects.create(user=User.objects.create_user(
+        username='other', email='other@example.com', password='other'
+    ), author=author)
+    recipe = Recipe.objects.create(author=author, name='Суп', text='Суп',
+                                   cooking_time=30, image='recipes/test.png')
+    # у автора больше подписчиков, чем порог: рецепт не раскладывается,
+    # а подмешивается при чтении
+    fan_out_recipe(recipe.pk)
+    assert not FeedEntry.objects.exists()
+    assert feed_ids(user_client) == [recipe.pk]
+
+    other.delete()
+    # после коммита отписки это делает фоновая задача
+    restore_author_feeds(author.pk)
+    assert FeedEntry.objects.filter(user=user, recipe=recipe).exists()
+    assert feed_ids(user_client) == [recipe.pk]
+
+
+@pytest.mark.django_db
+def test_feed_restored_when_unfollows_skip_threshold(
+        settings, user, user_client, author, django_assert_num_queries):
+    settings.FEED_FANOUT_MAX_FOLLOWERS = 3
+    Follow.objects.create(user=user, author=author)
+    others = [
+        Follow.objects.create(user=User.objects.create_user(
+            username=f'other{number}', email=f'other{number}@example.com',
+            password='other'
+        ), author=author)
+        for number in range(3)
+    ]
+    recipe = Recipe.objects.create(author=author, name='Суп', text='Суп',
+                                   cooking_time=30, image='recipes/test.png')
+    fan_out_recipe(recipe.pk)
+    assert not FeedEntry.objects.exists()
+
+    # две отписки подряд: обе задачи видят 2 подписчика, счетчик
+    # перескочил порог 3
+    for follow in others[:2]:
+        follow.delete()
+    author.refresh_from_db()
+    assert author.followers_count == 2
+    restore_author_feeds(author.pk)
+    assert set(FeedEntry.objects.filter(recipe=recipe).values_list(
+        'user_id', flat=True
+    )) == {user.pk, others[2].user_id}
+    # вторая задача видит, что рецепт уже у всех подписчиков
+    with django_assert_num_queries(3):
+        restore_author_feeds(author.pk)
+    assert FeedEntry.objects.filter(recipe=recipe).count() == 2
+    assert feed_ids(user_client) == [recipe.pk]
@@ -0,0 +1,56 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+from recipes.ingredient_index import INDEX_NAME, MAX_LIMIT
+from recipes.models import Ingredient, IndexVersion
+
+URL = '/api/ingredients/'
+
+
+@pytest.mark.django_db
+def test_search_sees_ingredients_added_by_another_process(guest_client,
+                                                          ingredients):
+    response = guest_client.get(URL, {'name': 'мо'})
+    assert [item['name'] for item in response.data] == ['молоко']
+    # другой процесс (например, load_ingredients) не трогает память
+    # этого процесса: добавляет строки без сигналов и меняет версию
+    Ingredient.objects.bulk_create([
+        Ingredient(name='морковь', measurement_unit='г')
+    ])
+    IndexVersion.objects.update_or_create(
+        name=INDEX_NAME, defaults={'version': 'other-process'}
+    )
+    response = guest_client.get(URL, {'name': 'мо'})
+    assert [item['name'] for item in response.data] == ['молоко', 'морковь']
+
+
+@pytest.mark.django_db
+def test_search_sees_ingredient_changes(guest_client, ingredients):
+    ingredients[0].name = 'мука ржаная'
+    ingredients[0].save()
+    response = guest_client.get(URL, {'name': 'мука'})
+    assert [item['name'] for item in response.data] == ['мука ржаная']
+
+
+@pytest.mark.django_db
+def test_search_limit_is_capped(guest_client):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'соль {number}', measurement_unit='г')
+        for number in range(MAX_LIMIT + 10)
+    )
+    response = guest_client.get(URL, {'name': 'соль', 'limit': 10 ** 6})
+    assert len(response.data) == MAX_LIMIT
+    response = guest_client.get(URL, {'name': 'соль', 'limit': 3})
+    assert len(response.data) == 3
+
+
+@pytest.mark.django_db
+def test_search_sees_loaded_ingredients(guest_client, ingredients, tmp_path):
+    assert guest_client.get(URL, {'name': 'соль'}).data == []
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('соль,г\nмука,г\n', encoding='utf-8')
+    call_command('load_ingredients', str(path), stdout=io.StringIO())
+    response = guest_client.get(URL, {'name': 'соль'})
+    assert [item['name'] for item in response.data] == ['соль']
@@ -0,0 +1,95 @@
+"""
+Картинки хранятся по хешу содержимого: файл удаляется, только когда на
+него не ссылается ни один рецепт и прошел срок MEDIA_BLOB_GRACE_PERIOD.
+"""
+import os
+import time
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from recipes.images import derivative_dir
+from recipes.models import Recipe
+
+IMAGE = b'\x89PNG image'
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+
+def save_image(content=IMAGE):
+    return default_storage.save('recipes/image.png', ContentFile(content))
+
+
+def make_old(name, settings):
+    past = time.time() - settings.MEDIA_BLOB_GRACE_PERIOD - 60
+    os.utime(default_storage.path(name), (past, past))
+
+
+def save_derivatives(name):
+    return default_storage.save(f'{derivative_dir(name)}/320.webp',
+                                ContentFile(b'webp'))
+
+
+def create_recipe(author, image):
+    return Recipe.objects.create(author=author, name=f'Рецепт {image}',
+                                 text='Описание', cooking_time=10,
+                                 image=image)
+
+
+@pytest.mark.django_db
+def test_shared_image_survives_release(settings, media_root, author):
+    name = save_image()
+    assert save_image() == name
+    first = create_recipe(author, name)
+    second = create_recipe(author, name)
+    make_old(name, settings)
+
+    first.delete()
+    assert not default_storage.release(name)
+    assert default_storage.exists(name)
+    second.delete()
+    assert default_storage.release(name)
+    assert not default_storage.exists(name)
+
+
+@pytest.mark.django_db
+def test_release_respects_grace_period(settings, media_root):
+    name = save_image()
+    derivatives = save_derivatives(name)
+    # файл только загружен, рецепт с ним еще не сохранен
+    assert not default_storage.release(name)
+    assert default_storage.exists(name)
+    make_old(name, settings)
+    assert default_storage.release(name)
+    assert not default_storage.exists(name)
+    assert not default_storage.exists(derivatives)
+
+
+@pytest.mark.django_db
+def test_collect_media_garbage(settings, media_root, author):
+    used = save_image(b'used')
+    create_recipe(author, used)
+    orphan = save_image(b'orphan')
+    fresh = save_image(b'fresh')
+    for name in (used, orphan):
+        make_old(name, settings)
+        make_old(save_derivatives(name), settings)
+        make_old(derivative_dir(name), settings)
+    fresh_derivatives = save_derivatives(fresh)
+
+    call_command('collect_media_garbage', '--dry-run')
+    assert default_storage.exists(orphan)
+
+    call_command('collect_media_garbage')
+    assert default_storage.exists(used)
+    assert default_storage.exists(derivative_dir(used))
+    assert default_storage.exists(fresh)
+    assert default_storage.exists(fresh_derivatives)
+    assert not default_storage.exists(orphan)
+    assert not default_storage.exists(derivative_dir(orphan))
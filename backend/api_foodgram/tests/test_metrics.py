@@ -0,0 +1,84 @@
+"""
+Замеренные запросы получают заголовок Server-Timing и попадают в
+гистограммы /api/_metrics/.
+"""
+import re
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api_foodgram import metrics
+
+LIST_URL = '/api/recipes/'
+METRICS_URL = '/api/_metrics/'
+# версия справочников для ETag, COUNT, рецепты страницы, теги,
+# ингредиенты
+LIST_QUERIES = 5
+TOKEN = 'metrics-token'
+
+
+@pytest.fixture
+def sampled(settings, monkeypatch):
+    settings.REQUEST_METRICS_SAMPLE_RATE = 1
+    settings.REQUEST_METRICS_TOKEN = TOKEN
+    monkeypatch.setattr(metrics, 'registry', metrics.Registry())
+
+
+@pytest.mark.django_db
+def test_server_timing_header(sampled, recipes):
+    response = APIClient().get(LIST_URL)
+    assert response.status_code == 200
+    timing = response['Server-Timing']
+    assert re.match(
+        rf'db;dur=[\d.]+;desc="{LIST_QUERIES} queries, 0 duplicate", '
+        r'view;dur=[\d.]+, total;dur=[\d.]+$',
+        timing
+    ), timing
+
+
+@pytest.mark.django_db
+def test_not_sampled_without_header(settings, recipes):
+    settings.REQUEST_METRICS_SAMPLE_RATE = 0
+    assert 'Server-Timing' not in APIClient().get(LIST_URL)
+
+
+@pytest.mark.django_db
+def test_metrics_view(sampled, recipes):
+    client = APIClient()
+    for _ in range(2):
+        client.get(LIST_URL)
+    assert client.get(METRICS_URL).status_code == 403
+
+    response = client.get(METRICS_URL,
+                          HTTP_AUTHORIZATION=f'Bearer {TOKEN}')
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain')
+    lines = response.content.decode().splitlines()
+    labels = 'route="recipes-list",method="GET"'
+    assert f'foodgram_request_duration_seconds_count{{{labels}}} 2' in lines
+    assert (f'foodgram_request_queries_sum{{{labels}}} {2 * LIST_QUERIES}'
+            in lines)
+    assert (f'foodgram_request_queries_bucket{{{labels},le="5"}} 2'
+            in lines)
+    assert f'foodgram_request_duplicate_queries_total{{{labels}}} 0' in lines
+
+
+@pytest.mark.django_db
+def test_streamed_queries_are_counted(sampled, user_client, recipes):
+    response = user_client.get('/api/recipes/download_shopping_cart/',
+                               {'format': 'txt'})
+    assert response.status_code == 200
+    with CaptureQueriesContext(connection) as streamed:
+        b''.join(response.streaming_content)
+    assert len(streamed) == 1
+    view_queries = int(re.search(r'"(\d+) queries',
+                                 response['Server-Timing']).group(1))
+    lines = APIClient().get(
+        METRICS_URL, HTTP_AUTHORIZATION=f'Bearer {TOKEN}'
+    ).content.decode().splitlines()
+    labels = 'route="recipes-get-shopping-cart",method="GET"'
+    # в гистограмму попадают и запросы, сделанные при чтении тела
+    assert (f'foodgram_request_queries_sum{{{labels}}} {view_queries + 1}'
+            in lines)
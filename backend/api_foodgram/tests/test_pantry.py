@@ -0,0 +1,59 @@
+import pytest
+
+from recipes.models import IngredientRecipe, Recipe
+from recipes.pantry_index import (PantryIndex, invalidate_pantry_index,
+                                  mark_recipe_changed)
+
+URL = '/api/recipes/pantry/'
+
+
+def matched_ids(index, ingredients):
+    return {recipe_id for recipe_id, _ in index.match(
+        [ingredient.pk for ingredient in ingredients]
+    )}
+
+
+@pytest.mark.django_db
+def test_pantry_index_sees_recipe_changed_elsewhere(recipes, ingredients):
+    index = PantryIndex()
+    egg = ingredients[2]
+    assert recipes[0].pk in matched_ids(index, [egg])
+    # другой процесс меняет рецепт; после коммита вызывается
+    # mark_recipe_changed
+    IngredientRecipe.objects.filter(recipe=recipes[0],
+                                    ingredient=egg).delete()
+    mark_recipe_changed(recipes[0].pk)
+    assert recipes[0].pk not in matched_ids(index, [egg])
+    assert recipes[1].pk in matched_ids(index, [egg])
+
+
+@pytest.mark.django_db
+def test_pantry_index_rebuilds_after_invalidation(recipes, author,
+                                                  ingredients):
+    index = PantryIndex()
+    egg = ingredients[2]
+    before = matched_ids(index, [egg])
+    # import_recipes и seed_synthetic пишут рецепты без отметок
+    # об изменениях и в конце сбрасывают индекс целиком
+    recipe = Recipe.objects.create(
+        author=author, name='Омлет', text='Описание', cooking_time=5,
+        image='recipes/test.png'
+    )
+    IngredientRecipe.objects.create(recipe=recipe, ingredient=egg, amount=2)
+    assert matched_ids(index, [egg]) == before
+    invalidate_pantry_index()
+    assert matched_ids(index, [egg]) == before | {recipe.pk}
+
+
+@pytest.mark.django_db
+def test_pantry_endpoint(guest_client, recipes, ingredients):
+    response = guest_client.get(URL, {
+        'ingredients': ','.join(str(item.pk) for item in ingredients[:2]),
+        'max_missing': 0,
+        'limit': 20,
+    })
+    assert response.status_code == 200
+    # у рецептов второго автора только мука и молоко
+    assert {recipe['id'] for recipe in response.data['results']} == {
+        recipe.pk for recipe in recipes[6:]
+    }
@@ -0,0 +1,138 @@
+"""
+Число запросов к базе у списка и карточки рецепта не зависит от размера
+страницы: связанные данные и флаги пользователя загружаются заранее.
+"""
+import pytest
+
+from recipes.models import UserFavoriteRecipe
+
+LIST_URL = '/api/recipes/'
+DETAIL_URL = '/api/recipes/{}/'
+# версия справочников для ETag: в тестах она перечитывается на каждый
+# запрос (INDEX_VERSION_CHECK_SECONDS = 0), в работе - раз в несколько
+# секунд
+REFERENCES_QUERIES = 1
+# COUNT, рецепты страницы, теги, ингредиенты
+LIST_QUERIES = 4 + REFERENCES_QUERIES
+# пагинация по ключу: рецепты страницы, теги, ингредиенты
+CURSOR_LIST_QUERIES = 3 + REFERENCES_QUERIES
+# при совпадении ETag теги и ингредиенты не загружаются
+NOT_MODIFIED_LIST_QUERIES = 2 + REFERENCES_QUERIES
+# версия для ETag, рецепт, теги, ингредиенты
+DETAIL_QUERIES = 4 + REFERENCES_QUERIES
+# токен с пользователем и подписки на авторов страницы
+USER_QUERIES = 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit', (2, 6))
+def test_recipe_list_anonymous(guest_client, recipes,
+                               django_assert_num_queries, limit):
+    with django_assert_num_queries(LIST_QUERIES):
+        response = guest_client.get(LIST_URL, {'limit': limit})
+    assert response.status_code == 200
+    assert len(response.data['results']) == limit
+    assert not any(recipe['is_favorited']
+                   for recipe in response.data['results'])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit', (2, 6))
+def test_recipe_list_authenticated(user_client, recipes,
+                                   django_assert_num_queries, limit):
+    with django_assert_num_queries(LIST_QUERIES + USER_QUERIES):
+        response = user_client.get(LIST_URL, {'limit': limit})
+    assert response.status_code == 200
+    assert len(response.data['results']) == limit
+
+
+@pytest.mark.django_db
+def test_recipe_list_flags(user_client, recipes):
+    response = user_client.get(LIST_URL, {'limit': len(recipes)})
+    results = {recipe['id']: recipe for recipe in response.data['results']}
+    for number, recipe in enumerate(recipes):
+        data = results[recipe.pk]
+        assert data['is_favorited'] == (number % 3 == 0)
+        assert data['is_in_shopping_cart'] == (number % 4 == 1)
+        assert data['author']['is_subscribed'] == (
+            recipe.author.username == 'author'
+        )
+        assert len(data['ingredients']) == recipe.ingredients.count()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('client_name', ('guest_client', 'user_client'))
+def test_recipe_detail(request, recipes, django_assert_num_queries,
+                       client_name):
+    client = request.getfixturevalue(client_name)
+    queries = DETAIL_QUERIES
+    if client_name == 'user_client':
+        queries += USER_QUERIES
+    with django_assert_num_queries(queries):
+        response = client.get(DETAIL_URL.format(recipes[0].pk))
+    assert response.status_code == 200
+    assert response.data['id'] == recipes[0].pk
+    assert len(response.data['tags']) == 2
+
+
+@pytest.mark.django_db
+def test_recipe_list_not_modified(guest_client, recipes,
+                                  django_assert_num_queries):
+    etag = guest_client.get(LIST_URL)['ETag']
+    with django_assert_num_queries(NOT_MODIFIED_LIST_QUERIES):
+        response = guest_client.get(LIST_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+
+
+@pytest.mark.django_db
+def test_recipe_list_etag_follows_page_rows(user, user_client, recipes):
+    etag = user_client.get(LIST_URL)['ETag']
+    page_ids = [
+        recipe['id'] for recipe in user_client.get(LIST_URL).data['results']
+    ]
+    # рецепт на другой странице не меняет версию страницы
+    hidden = next(recipe for recipe in recipes if recipe.pk not in page_ids
+                  and not recipe.favorite_recipes.filter(user=user).exists())
+    UserFavoriteRecipe.objects.create(user=user, recipe=hidden)
+    assert user_client.get(LIST_URL)['ETag'] == etag
+    shown = next(recipe for recipe in recipes if recipe.pk in page_ids
+                 and not recipe.favorite_recipes.filter(user=user).exists())
+    UserFavoriteRecipe.objects.create(user=user, recipe=shown)
+    response = user_client.get(LIST_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_recipe_cursor_list_skips_count(guest_client, recipes,
+                                        django_assert_num_queries):
+    url = f'{LIST_URL}?cursor=&limit=4'
+    seen = []
+    while url:
+        with django_assert_num_queries(CURSOR_LIST_QUERIES) as queries:
+            response = guest_client.get(url)
+        assert response.status_code == 200
+        assert not any('COUNT(' in query['sql'].upper()
+                       for query in queries.captured_queries)
+        seen.extend(recipe['id'] for recipe in response.data['results'])
+        url = response.data['next']
+    assert seen == [recipe.pk for recipe in reversed(recipes)]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', (LIST_URL, DETAIL_URL))
+def test_recipe_etag_follows_renames(guest_client, recipes, tags,
+                                     ingredients, url):
+    url = url.format(recipes[-1].pk)
+    etags = {guest_client.get(url)['ETag']}
+    # последний рецепт есть и на первой странице списка
+    renames = ((recipes[-1].author, 'first_name', 'Renamed'),
+               (tags[0], 'name', 'Ранний завтрак'),
+               (ingredients[0], 'name', 'мука пшеничная'))
+    for obj, field, value in renames:
+        setattr(obj, field, value)
+        obj.save()
+        etag = guest_client.get(url)['ETag']
+        assert etag not in etags
+        etags.add(etag)
@@ -0,0 +1,52 @@
+"""
+Рецепты, выгруженные export_recipes, загружаются import_recipes без
+потерь.
+"""
+import pytest
+from django.core.management import call_command
+
+from recipes.management.commands.export_recipes import serialize_recipe
+from recipes.models import Recipe
+from users.models import User
+
+
+def snapshot():
+    return [serialize_recipe(recipe) for recipe in Recipe.objects.order_by(
+        'pub_date', 'id'
+    ).select_related('author').prefetch_related(
+        'tags', 'ingredientrecipe_set__ingredient'
+    )]
+
+
+@pytest.mark.django_db
+def test_export_import_round_trip(tmp_path, recipes):
+    path = tmp_path / 'recipes.jsonl'
+    before = snapshot()
+    call_command('export_recipes', str(path), '--chunk-size', '5')
+    assert len(path.read_text(encoding='utf-8').splitlines()) == len(recipes)
+
+    Recipe.objects.all().delete()
+    call_command('import_recipes', str(path), '--chunk-size', '5')
+    assert snapshot() == before
+    for author in User.objects.all():
+        assert author.recipes_count == author.recipes.count()
+
+
+@pytest.mark.django_db
+def test_import_skips_bad_lines_and_resumes(tmp_path, recipes):
+    path = tmp_path / 'recipes.jsonl'
+    checkpoint = tmp_path / 'recipes.jsonl.progress'
+    call_command('export_recipes', str(path))
+    lines = path.read_text(encoding='utf-8').splitlines()
+    path.write_text('\n'.join(lines[:2] + ['{broken'] + lines[2:4]) + '\n',
+                    encoding='utf-8')
+    Recipe.objects.all().delete()
+
+    call_command('import_recipes', str(path), '--chunk-size', '2',
+                 '--checkpoint', str(checkpoint))
+    assert Recipe.objects.count() == 4
+    assert checkpoint.read_text() == '5'
+    # повторный запуск продолжает с сохраненной строки
+    call_command('import_recipes', str(path), '--checkpoint',
+                 str(checkpoint))
+    assert Recipe.objects.count() == 4
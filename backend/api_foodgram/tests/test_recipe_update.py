@@ -0,0 +1,46 @@
+"""
+Изменение рецепта пишет только отличия от сохраненных ингредиентов,
+а версия рецепта растет в том же UPDATE, что и его поля.
+"""
+import pytest
+
+from recipes.models import IngredientRecipe
+
+RECIPE_URL = '/api/recipes/{}/'
+# токен, рецепт, автор, проверка ингредиентов, точки сохранения,
+# UPDATE рецепта с версией, новая версия, разница ингредиентов,
+# списки покупок и ответ
+UPDATE_QUERIES = 19
+
+
+def get_rows(recipe):
+    return {
+        row.ingredient_id: (row.pk, row.amount)
+        for row in IngredientRecipe.objects.filter(recipe=recipe)
+    }
+
+
+@pytest.mark.django_db
+def test_recipe_update_writes_diff(author_client, recipes, ingredients,
+                                   django_assert_num_queries):
+    recipe = recipes[0]
+    before = get_rows(recipe)
+    with django_assert_num_queries(UPDATE_QUERIES) as queries:
+        response = author_client.patch(RECIPE_URL.format(recipe.pk), {
+            'ingredients': [{'id': ingredients[0].pk, 'amount': 100},
+                            {'id': ingredients[1].pk, 'amount': 250}],
+        }, format='json')
+    assert response.status_code == 200
+    after = get_rows(recipe)
+    # неизмененная строка не пересоздается, измененная обновляется,
+    # удаленная удаляется
+    assert after == {
+        ingredients[0].pk: before[ingredients[0].pk],
+        ingredients[1].pk: (before[ingredients[1].pk][0], 250),
+    }
+    recipe_updates = [query['sql'] for query in queries.captured_queries
+                      if query['sql'].startswith('UPDATE "recipes_recipe"')]
+    assert len(recipe_updates) == 1
+    revision = recipe.revision
+    recipe.refresh_from_db()
+    assert recipe.revision == revision + 1
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api_foodgram.db_router import PIN_COOKIE_NAME, REPLICA_DB_ALIAS
+
+LIST_URL = '/api/recipes/'
+FAVORITE_URL = '/api/recipes/favorite/'
+
+pytestmark = pytest.mark.django_db(databases=['default', REPLICA_DB_ALIAS])
+
+
+@pytest.fixture(autouse=True)
+def replica_routing(settings):
+    settings.DATABASE_ROUTERS = ['api_foodgram.db_router.ReplicaRouter']
+    settings.MIDDLEWARE = [
+        *settings.MIDDLEWARE[:2],
+        'api_foodgram.db_router.ReplicaPinMiddleware',
+        *settings.MIDDLEWARE[2:],
+    ]
+
+
+@pytest.fixture
+def replica_user(user, token):
+    # реплика отстает: в ней есть пользователь и токен, но нет рецептов
+    user.save(using=REPLICA_DB_ALIAS, force_insert=True)
+    token.save(using=REPLICA_DB_ALIAS, force_insert=True)
+    return user
+
+
+def token_client(token):
+    # новый клиент без cookie, например другой экземпляр приложения
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def pin(client, recipe):
+    response = client.post(FAVORITE_URL, {'recipes': [recipe.pk]},
+                           format='json')
+    assert response.status_code == 200
+    return response
+
+
+def test_get_reads_from_replica(guest_client, recipes):
+    with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as queries:
+        response = guest_client.get(LIST_URL)
+    assert response.status_code == 200
+    assert response.data['count'] == 0
+    assert len(queries) > 0
+
+
+def test_write_pins_with_cookie(settings, user_client, replica_user,
+                                recipes):
+    settings.DB_REPLICA_PIN_SECONDS = 30
+    response = pin(user_client, recipes[0])
+    cookie = response.cookies[PIN_COOKIE_NAME]
+    assert cookie['max-age'] == 30
+    assert cookie['httponly']
+    response = user_client.get(LIST_URL)
+    assert response.data['count'] == len(recipes)
+
+
+def test_write_pins_authorization(user_client, token, replica_user,
+                                  recipes):
+    pin(user_client, recipes[0])
+    response = token_client(token).get(LIST_URL)
+    assert response.data['count'] == len(recipes)
+
+
+def test_reads_return_to_replica_after_pin(settings, user_client, token,
+                                           replica_user, recipes):
+    settings.DB_REPLICA_PIN_SECONDS = 1
+    pin(user_client, recipes[0])
+    time.sleep(1.1)
+    response = token_client(token).get(LIST_URL)
+    assert response.status_code == 200
+    assert response.data['count'] == 0
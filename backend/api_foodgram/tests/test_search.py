@@ -0,0 +1,53 @@
+"""
+Полнотекстовый поиск на SQLite идет через таблицу FTS5 и сортирует
+рецепты по релевантности.
+"""
+import pytest
+
+from recipes.models import Recipe
+
+URL = '/api/recipes/search/'
+
+
+def create_recipe(author, name, text):
+    return Recipe.objects.create(author=author, name=name, text=text,
+                                 cooking_time=10, image='recipes/test.png')
+
+
+def search(client, query):
+    response = client.get(URL, {'q': query})
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+@pytest.mark.django_db
+def test_search_ranking(guest_client, author):
+    best = create_recipe(author, 'Борщ', 'Борщ со свеклой, борщ на обед')
+    weak = create_recipe(author, 'Суп дня',
+                         'Подойдет к обеду вместо супа или борщ, если '
+                         'в холодильнике нашлись капуста, морковь, лук, '
+                         'картофель и немного зелени к столу')
+    pancakes = create_recipe(author, 'Оладьи', 'Мука, молоко, яйца')
+    assert search(guest_client, 'борщ') == [best.pk, weak.pk]
+    # слова ищутся как префиксы
+    assert search(guest_client, 'бор') == [best.pk, weak.pk]
+    # все слова запроса должны найтись в названии или описании
+    assert search(guest_client, 'оладьи молоко') == [pancakes.pk]
+    assert search(guest_client, 'оладьи борщ') == []
+
+
+@pytest.mark.django_db
+def test_search_follows_updates(guest_client, author):
+    recipe = create_recipe(author, 'Оладьи', 'Мука, молоко, яйца')
+    assert search(guest_client, 'блины') == []
+    recipe.name = 'Блины'
+    recipe.save()
+    assert search(guest_client, 'блины') == [recipe.pk]
+    recipe.delete()
+    assert search(guest_client, 'блины') == []
+
+
+@pytest.mark.django_db
+def test_search_requires_query(guest_client):
+    assert guest_client.get(URL, {'q': ' '}).status_code == 400
+    assert search(guest_client, '"*') == []
@@ -0,0 +1,65 @@
+"""
+Выгрузка списка покупок: pdf рендерится заново только после изменения
+корзины, txt, csv и json отдаются потоком.
+"""
+import json
+
+import pytest
+
+URL = '/api/recipes/download_shopping_cart/'
+CART_URL = '/api/recipes/{}/shopping_cart/'
+
+
+def download(client, **params):
+    response = client.get(URL, params)
+    assert response.status_code == 200
+    content = b''.join(response.streaming_content)
+    response.close()
+    return content
+
+
+@pytest.mark.django_db
+def test_pdf_cache_hit_and_miss(user_client, recipes, rendered_pdfs):
+    first = download(user_client)
+    assert first.startswith(b'%PDF')
+    assert download(user_client) == first
+    assert len(rendered_pdfs) == 1
+
+    # корзина изменилась: документ рендерится заново
+    assert user_client.post(CART_URL.format(recipes[0].pk)).status_code == 201
+    assert download(user_client) != first
+    assert len(rendered_pdfs) == 2
+
+
+# корзина пользователя: рецепты 1 и 5 автора и рецепт 9 другого автора
+EXPECTED = [('молоко', 'мл', 600), ('мука', 'г', 300), ('яйца', 'шт', 600)]
+
+
+@pytest.mark.django_db
+def test_txt_stream(user_client, recipes):
+    content = download(user_client, format='txt').decode()
+    assert content.splitlines() == [
+        f'{name} ({unit}) - {amount}' for name, unit, amount in EXPECTED
+    ]
+
+
+@pytest.mark.django_db
+def test_csv_stream(user_client, recipes):
+    content = download(user_client, format='csv').decode()
+    assert content.splitlines() == ['name,measurement_unit,amount'] + [
+        f'{name},{unit},{amount}' for name, unit, amount in EXPECTED
+    ]
+
+
+@pytest.mark.django_db
+def test_json_stream(user_client, recipes):
+    content = json.loads(download(user_client, format='json'))
+    assert content == [
+        {'name': name, 'measurement_unit': unit, 'amount': amount}
+        for name, unit, amount in EXPECTED
+    ]
+
+
+@pytest.mark.django_db
+def test_empty_stream(author_client, recipes):
+    assert json.loads(download(author_client, format='json')) == []
@@ -0,0 +1,67 @@
+import pytest
+from django.db.transaction import TransactionManagementError
+
+from recipes.shopping_list import (get_live_shopping_lists,
+                                   get_stored_shopping_lists,
+                                   lock_shopping_lists)
+
+RECIPE_URL = '/api/recipes/{}/'
+CART_URL = '/api/recipes/{}/shopping_cart/'
+BULK_CART_URL = '/api/recipes/shopping_cart/'
+
+
+def assert_consistent(user):
+    stored = get_stored_shopping_lists([user.pk])
+    assert stored == get_live_shopping_lists([user.pk])
+    return stored
+
+
+@pytest.mark.django_db
+def test_cart_add_and_remove(user, user_client, recipes):
+    # в фикстуре рецепты 1, 5 и 9 уже в корзине
+    before = assert_consistent(user)
+    assert user_client.post(CART_URL.format(recipes[0].pk)).status_code == 201
+    assert assert_consistent(user) != before
+    assert user_client.delete(
+        CART_URL.format(recipes[0].pk)
+    ).status_code == 204
+    assert assert_consistent(user) == before
+
+
+@pytest.mark.django_db
+def test_bulk_cart_add_and_remove(user, user_client, recipes):
+    ids = [recipe.pk for recipe in recipes]
+    response = user_client.post(BULK_CART_URL, {'recipes': ids[:6]},
+                                format='json')
+    assert response.status_code == 200
+    assert_consistent(user)
+    response = user_client.delete(BULK_CART_URL, {'recipes': ids[3:]},
+                                  format='json')
+    assert response.status_code == 200
+    assert assert_consistent(user)
+
+
+@pytest.mark.django_db
+def test_recipe_amounts_edit(user, author_client, recipes, ingredients):
+    # рецепт 1 в корзине пользователя
+    response = author_client.patch(RECIPE_URL.format(recipes[1].pk), {
+        'ingredients': [{'id': ingredients[0].pk, 'amount': 555},
+                        {'id': ingredients[2].pk, 'amount': 7}],
+    }, format='json')
+    assert response.status_code == 200
+    stored = assert_consistent(user)
+    assert stored[(user.pk, ingredients[1].pk)] < stored[
+        (user.pk, ingredients[0].pk)
+    ]
+
+
+@pytest.mark.django_db
+def test_recipe_delete(user, author_client, recipes):
+    response = author_client.delete(RECIPE_URL.format(recipes[1].pk))
+    assert response.status_code == 204
+    assert_consistent(user)
+
+
+def test_lock_requires_transaction():
+    with pytest.raises(TransactionManagementError):
+        lock_shopping_lists([1])
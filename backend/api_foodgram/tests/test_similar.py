@@ -0,0 +1,78 @@
+"""
+Похожие рецепты: инкрементальный пересчет переписывает только
+измененные рецепты и те, чьи списки от них зависят.
+"""
+import pytest
+
+from recipes.models import (Ingredient, IngredientRecipe, Recipe,
+                            RecipeNeighbor)
+from recipes.similarity import update_similar_recipes
+
+URL = '/api/recipes/{}/similar/'
+
+
+@pytest.fixture
+def similar_recipes(settings, author):
+    settings.SIMILAR_RECIPES_COUNT = 10
+    ingredients = [
+        Ingredient.objects.create(name=f'ингредиент {number}',
+                                  measurement_unit='г')
+        for number in range(6)
+    ]
+    recipes = {}
+    for name, numbers in (('a', (0, 1)), ('b', (0, 2)), ('c', (3, 4)),
+                          ('d', (4, 5)), ('e', (5,))):
+        recipes[name] = Recipe.objects.create(
+            author=author, name=name, text=name, cooking_time=10,
+            image='recipes/test.png'
+        )
+        for number in numbers:
+            IngredientRecipe.objects.create(recipe=recipes[name],
+                                            ingredient=ingredients[number],
+                                            amount=1)
+    return recipes, ingredients
+
+
+def get_neighbors(recipes):
+    names = {recipe.pk: name for name, recipe in recipes.items()}
+    neighbors = {name: set() for name in recipes}
+    for recipe_id, neighbor_id in RecipeNeighbor.objects.values_list(
+            'recipe_id', 'neighbor_id'):
+        neighbors[names[recipe_id]].add(names[neighbor_id])
+    return neighbors
+
+
+@pytest.mark.django_db
+def test_incremental_update_matches_full(guest_client, similar_recipes):
+    recipes, ingredients = similar_recipes
+    assert update_similar_recipes() == len(recipes)
+    assert get_neighbors(recipes) == {
+        'a': {'b'}, 'b': {'a'}, 'c': {'d'}, 'd': {'c', 'e'}, 'e': {'d'},
+    }
+    assert update_similar_recipes() == 0
+
+    # рецепт a теперь похож на c, а не на b
+    recipe = recipes['a']
+    IngredientRecipe.objects.filter(recipe=recipe).delete()
+    IngredientRecipe.objects.create(recipe=recipe,
+                                    ingredient=ingredients[3], amount=1)
+    recipe.bump_revision()
+    # пересчитываются a, b (a был в ее списке) и c (a стал ей ближе)
+    assert update_similar_recipes() == 3
+    incremental = get_neighbors(recipes)
+    assert incremental == {
+        'a': {'c'}, 'b': set(), 'c': {'a', 'd'}, 'd': {'c', 'e'},
+        'e': {'d'},
+    }
+    assert update_similar_recipes(full=True) == len(recipes)
+    assert get_neighbors(recipes) == incremental
+
+    response = guest_client.get(URL.format(recipe.pk))
+    assert response.status_code == 200
+    assert [item['id'] for item in response.data] == [recipes['c'].pk]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('pk', ('abc', '999'))
+def test_similar_unknown_recipe(guest_client, pk):
+    assert guest_client.get(URL.format(pk)).status_code == 404
@@ -0,0 +1,116 @@
+"""
+Флаг is_subscribed проверяется только для авторов текущей страницы,
+число запросов списка подписок не зависит от размера страницы.
+"""
+import pytest
+
+from recipes.models import Recipe
+from tests.conftest import create_recipes, create_user
+from users.models import Follow
+
+USERS_URL = '/api/users/'
+SUBSCRIPTIONS_URL = '/api/users/subscriptions/'
+# токен с пользователем, COUNT, подписки страницы с авторами,
+# рецепты авторов
+SUBSCRIPTIONS_QUERIES = 4
+
+
+def follow_queries(queries):
+    return [query['sql'] for query in queries.captured_queries
+            if 'users_follow' in query['sql']]
+
+
+@pytest.mark.django_db
+def test_users_is_subscribed(user, user_client, recipes,
+                             django_assert_max_num_queries):
+    with django_assert_max_num_queries(10) as queries:
+        response = user_client.get(USERS_URL)
+    assert response.status_code == 200
+    flags = {item['username']: item['is_subscribed']
+             for item in response.data['results']}
+    assert flags == {'reader': False, 'author': True, 'other': False}
+    # подписки проверяются одним запросом по авторам страницы
+    follows, = follow_queries(queries)
+    assert ' IN (' in follows
+
+
+@pytest.mark.django_db
+def test_user_detail_is_subscribed(author, user_client, recipes):
+    response = user_client.get(f'{USERS_URL}{author.pk}/')
+    assert response.status_code == 200
+    assert response.data['is_subscribed'] is True
+    other = recipes[-1].author
+    response = user_client.get(f'{USERS_URL}{other.pk}/')
+    assert response.data['is_subscribed'] is False
+
+
+@pytest.mark.django_db
+def test_follows_outside_page_are_not_loaded(user, user_client, recipes,
+                                             django_assert_max_num_queries):
+    for number in range(20):
+        Follow.objects.create(user=user, author=create_user(f'user{number}'))
+    with django_assert_max_num_queries(10) as queries:
+        response = user_client.get('/api/recipes/', {'limit': 3})
+    follows, = follow_queries(queries)
+    assert ' IN (' in follows
+    assert all(recipe['author']['is_subscribed']
+               == (recipe['author']['username'] == 'author')
+               for recipe in response.data['results'])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit', (1, 5))
+@pytest.mark.parametrize('recipes_limit', ('', '2'))
+def test_subscriptions_queries(user, user_client, tags, ingredients,
+                               django_assert_num_queries, limit,
+                               recipes_limit):
+    for number in range(5):
+        author = create_user(f'user{number}')
+        create_recipes(author, 3, tags, ingredients)
+        Follow.objects.create(user=user, author=author)
+    with django_assert_num_queries(SUBSCRIPTIONS_QUERIES):
+        response = user_client.get(SUBSCRIPTIONS_URL, {
+            'limit': limit, 'recipes_limit': recipes_limit
+        })
+    assert response.status_code == 200
+    assert len(response.data['results']) == limit
+    assert all(item['is_subscribed'] for item in response.data['results'])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('recipes_limit', (None, 2))
+def test_subscriptions_recipes(user, user_client, tags, ingredients,
+                               recipes_limit):
+    authors = [create_user(f'user{number}') for number in range(3)]
+    for count, author in enumerate(authors, start=1):
+        create_recipes(author, count, tags, ingredients)
+        Follow.objects.create(user=user, author=author)
+    params = {'limit': 2}
+    if recipes_limit is not None:
+        params['recipes_limit'] = recipes_limit
+    response = user_client.get(SUBSCRIPTIONS_URL, params)
+    assert response.status_code == 200
+    assert response.data['count'] == len(authors)
+    assert len(response.data['results']) == 2
+    for item in response.data['results']:
+        author_recipes = Recipe.objects.filter(
+            author_id=item['id']
+        ).order_by('-pub_date', '-id')
+        expected = [recipe.pk for recipe in author_recipes]
+        if recipes_limit is not None:
+            expected = expected[:recipes_limit]
+        assert [recipe['id'] for recipe in item['recipes']] == expected
+        assert item['recipes_count'] == author_recipes.count()
+
+
+@pytest.mark.django_db
+def test_subscribe_returns_limited_recipes(user_client, author, recipes):
+    Follow.objects.all().delete()
+    response = user_client.post(
+        f'{USERS_URL}{author.pk}/subscribe/?recipes_limit=1'
+    )
+    assert response.status_code == 201
+    assert response.data['recipes_count'] == 6
+    assert [recipe['id'] for recipe in response.data['recipes']] == [
+        recipes[5].pk
+    ]
@@ -0,0 +1,46 @@
+"""
+ordering=trending сортирует рецепты по рейтингу, который считает
+update_trending_scores: новые добавления весят больше старых.
+"""
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from recipes.models import UserFavoriteRecipe
+from recipes.trending import update_trending_scores
+
+URL = '/api/recipes/'
+
+
+def trending_ids(client):
+    response = client.get(URL, {'ordering': 'trending', 'limit': 20})
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+@pytest.mark.django_db
+def test_trending_order(settings, guest_client, author, recipes):
+    now = timezone.now()
+    # избранное пользователя: 0, 3, 6, 9 (по 1.0), корзина: 1, 5, 9
+    # (по 0.5)
+    assert update_trending_scores(now) == 6
+    ranked = [9, 6, 3, 0, 5, 1]
+    unranked = [11, 10, 8, 7, 4, 2]
+    assert trending_ids(guest_client) == [
+        recipes[number].pk for number in ranked + unranked
+    ]
+
+    # через период полураспада добавление весит вдвое больше:
+    # рецепт 1 получает 0.5 + 2.0, рецепт 2 - 2.0
+    for number in (1, 2):
+        UserFavoriteRecipe.objects.create(user=author, recipe=recipes[number])
+    later = now + timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+    assert update_trending_scores(later) == 2
+    # повторный пересчет без новых записей ничего не меняет
+    assert update_trending_scores(later) == 0
+    ranked = [1, 2, 9, 6, 3, 0, 5]
+    unranked = [11, 10, 8, 7, 4]
+    assert trending_ids(guest_client) == [
+        recipes[number].pk for number in ranked + unranked
+    ]
@@ -0,0 +1,39 @@
+import pytest
+
+from recipes.models import Recipe
+from recipes.shopping_list import (get_live_shopping_lists,
+                                   get_stored_shopping_lists)
+
+FAVORITE_URL = '/api/recipes/favorite/'
+SHOPPING_CART_URL = '/api/recipes/shopping_cart/'
+
+
+def favorites_counts():
+    return dict(Recipe.objects.values_list('id', 'favorites_count'))
+
+
+def real_favorites_counts():
+    return {
+        recipe.pk: recipe.favorite_recipes.count()
+        for recipe in Recipe.objects.all()
+    }
+
+
+@pytest.mark.django_db
+def test_bulk_changes_keep_derived_data_consistent(user, user_client,
+                                                   recipes):
+    ids = [recipe.pk for recipe in recipes]
+    for url in (FAVORITE_URL, SHOPPING_CART_URL):
+        # часть рецептов уже в списках пользователя
+        response = user_client.post(url, {'recipes': ids[:8]},
+                                    format='json')
+        assert response.status_code == 200
+        response = user_client.delete(url, {'recipes': ids[4:]},
+                                      format='json')
+        assert response.status_code == 200
+        assert response.data['recipes'] == sorted(ids[:4])
+    assert favorites_counts() == real_favorites_counts()
+    assert get_stored_shopping_lists([user.pk]) == get_live_shopping_lists(
+        [user.pk]
+    )
+    assert get_stored_shopping_lists([user.pk])
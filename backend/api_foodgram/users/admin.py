@@ -6,7 +6,8 @@ from users.models import Follow, User
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     """Создание объекта для настройки параметров админки."""
-    list_display = ('id', 'username', 'email')
+    list_display = ('id', 'username', 'email', 'recipes_count',
+                    'followers_count')
     list_filter = ('username', 'email', )
     empty_value_display = '-пусто-'
 
@@ -0,0 +1,114 @@
+"""
+Аутентификация по токену с кешем.
+
+TokenAuthentication на каждый запрос читает токен вместе с пользователем.
+Здесь пара (пользователь, токен) после первого чтения кешируется. Если
+задан AUTH_TOKEN_CACHE_ALIAS, она хранится только в этом общем для
+процессов кеше django на AUTH_TOKEN_CACHE_TTL секунд, иначе - в LRU
+процесса на AUTH_TOKEN_LOCAL_CACHE_TTL секунд. Записи удаляются при
+удалении токена (выход через token_destroy, удаление пользователя) и при
+сохранении пользователя (смена пароля, блокировка), см. users/signals.py.
+Без общего кеша другие процессы узнают об этом только по истечении
+AUTH_TOKEN_LOCAL_CACHE_TTL, поэтому он измеряется секундами.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+SHARED_CACHE_KEY = 'auth_token_{}'
+
+
+class TokenCache:
+    """Общий кеш django или LRU процесса с временем жизни записей."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get_shared_cache(self):
+        alias = settings.AUTH_TOKEN_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def get_shared_key(self, key):
+        return SHARED_CACHE_KEY.format(
+            hashlib.sha256(key.encode()).hexdigest()
+        )
+
+    def get(self, key):
+        shared_cache = self.get_shared_cache()
+        if shared_cache is not None:
+            # копия в процессе не хранится: удаление записи любым
+            # процессом сразу видно всем
+            return shared_cache.get(self.get_shared_key(key))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                return value
+            del self.entries[key]
+        return None
+
+    def set(self, key, value):
+        shared_cache = self.get_shared_cache()
+        if shared_cache is not None:
+            shared_cache.set(self.get_shared_key(key), value,
+                             timeout=settings.AUTH_TOKEN_CACHE_TTL)
+            return
+        with self.lock:
+            self.entries[key] = (
+                time.monotonic() + settings.AUTH_TOKEN_LOCAL_CACHE_TTL, value
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def delete(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+        shared_cache = self.get_shared_cache()
+        if shared_cache is not None:
+            shared_cache.delete_many(
+                [self.get_shared_key(key) for key in keys]
+            )
+
+
+token_cache = TokenCache()
+
+
+def invalidate_tokens(keys):
+    token_cache.delete(list(keys))
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+        user, token = cached
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'User inactive or deleted.'
+            )
+        # объект пользователя общий для потоков процесса,
+        # запрос получает свою копию
+        return copy.copy(user), token
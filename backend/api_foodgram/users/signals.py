@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import invalidate_tokens, invalidate_user_tokens
+from users.models import Follow, User
+from users.utils import change_counter
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # выход (djoser token_destroy) и каскад при удалении пользователя;
+    # после коммита, чтобы параллельный запрос не вернул токен в кеш
+    transaction.on_commit(lambda: invalidate_tokens([instance.key]))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw, update_fields, **kwargs):
+    # смена пароля, блокировка и другие изменения пользователя; вход
+    # сохраняет только last_login, закешированный пользователь при этом
+    # остается верным
+    if created or update_fields == {'last_login'}:
+        return
+    transaction.on_commit(lambda: invalidate_user_tokens(instance.pk))
@@ -0,0 +1,16 @@
+from django.db.models import F
+
+
+def change_counter(model, pk, field, delta):
+    """Меняет счетчик одним UPDATE в транзакции текущей записи."""
+    change_counters(model, [pk], field, delta)
+
+
+def change_counters(model, pks, field, delta):
+    """То же для нескольких объектов, тоже одним UPDATE."""
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        # разошедшийся с данными счетчик не уходит в минус,
+        # его исправит reconcile_counters
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})